@@ -1,21 +1,43 @@
+import json
 import os
-from flask import Flask, request, send_file, render_template_string
-from PIL import Image
-import pytesseract
-import pandas as pd
-import io
-
-# 🚨 CRITICAL FIX: SET THE TESSERACT EXECUTABLE PATH HERE 🚨
-# Use 'r' before the string (r'...') to handle backslashes correctly
-# REPLACE THE EXAMPLE PATH BELOW WITH YOUR ACTUAL PATH!
-# The original error message implies this is the path:
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+import time
+from flask import Flask, Response, g, request, send_file, render_template_string, jsonify, url_for
+from ocr_pipeline import split_pages
+from exporters import EXPORT_FORMATS, export_pages, negotiate_format, preload as preload_exporters
+from ocr_jobs import JobQueue, QueueFull
+from ocr_cache import OCRCache
+from ingest import MAX_UPLOAD_BYTES, UploadRejected, check_image, read_upload
+from metrics import Metrics, timed, timed_iter
 
 app = Flask(__name__)
 # ... rest of your code ...
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Refuse oversized request bodies up front (413), set with OCR_MAX_UPLOAD_MB
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# OCR results keyed by image hash + config, so re-uploads skip Tesseract (see /cache/stats)
+ocr_cache = OCRCache(os.path.join(UPLOAD_FOLDER, 'ocr_cache'),
+                     max_entries=int(os.environ.get('OCR_CACHE_ENTRIES', 512)))
+
+# Per-stage latency histograms, served on /metrics. Requests slower than
+# OCR_SLOW_REQUEST_SECONDS are also logged with their stage breakdown (0 = off).
+metrics = Metrics()
+SLOW_REQUEST_SECONDS = float(os.environ.get('OCR_SLOW_REQUEST_SECONDS', 0))
+
+# Warm OCR worker pool, used by /convert and the background jobs (see /jobs below).
+# Size it with OCR_WORKERS (default one per core); workers are replaced every OCR_RECYCLE_AFTER jobs.
+job_queue = JobQueue(max_workers=int(os.environ.get('OCR_WORKERS', 0)) or None, cache=ocr_cache,
+                     recycle_after=int(os.environ.get('OCR_RECYCLE_AFTER', 500)), metrics=metrics)
+# EXPORT_PRELOAD=1 imports the xlsx/parquet writers at startup instead of on the
+# first download; run with `gunicorn --preload` so the forked web workers share
+# them copy-on-write. The OCR engine is not loaded here: the web processes never
+# OCR, and the pool's forkserver preloads it for the workers.
+if os.environ.get('EXPORT_PRELOAD') == '1':
+    preload_exporters()
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
 
 # A simple HTML template for a single-file application
 HTML_TEMPLATE = """
@@ -34,6 +56,9 @@ HTML_TEMPLATE = """
         #status { margin-top: 20px; font-weight: bold; }
         #download-link { display: none; margin-top: 20px; }
         #download-link a { text-decoration: none; color: royalblue; }
+        #preview { margin-top: 20px; max-height: 400px; overflow: auto; }
+        #preview table { border-collapse: collapse; margin: auto; font-size: 14px; }
+        #preview td { border: 1px solid #ddd; padding: 2px 8px; }
     </style>
 </head>
 <body>
@@ -48,9 +73,30 @@ HTML_TEMPLATE = """
         <div id="download-link">
             <a id="download-anchor" href="#" download="converted_table.xlsx">✅ Download Converted Excel File</a>
         </div>
+        <div id="preview"></div>
     </div>
 
     <script>
+        // Show at most this many preview rows, the download has all of them
+        const PREVIEW_ROWS = 200;
+
+        function renderPreview(bands) {
+            const table = document.createElement('table');
+            let count = 0;
+            // Bands can finish in any order; show them top to bottom
+            for (const rows of bands) {
+                for (const row of rows || []) {
+                    if (count++ >= PREVIEW_ROWS) break;
+                    const tr = table.insertRow();
+                    for (const cell of row) {
+                        tr.insertCell().textContent = cell;
+                    }
+                }
+            }
+            const preview = document.getElementById('preview');
+            preview.replaceChildren(table);
+        }
+
         document.getElementById('upload-form').addEventListener('submit', async function(event) {
             event.preventDefault();
             
@@ -58,37 +104,58 @@ HTML_TEMPLATE = """
             const downloadLinkDiv = document.getElementById('download-link');
             const downloadAnchor = document.getElementById('download-anchor');
             
-            statusDiv.textContent = 'Processing... Please wait.';
+            statusDiv.textContent = 'Uploading...';
             downloadLinkDiv.style.display = 'none';
+            document.getElementById('preview').replaceChildren();
 
             const formData = new FormData(this);
 
             try {
-                const response = await fetch('/convert', {
+                // stream=1: the server sends NDJSON events while it works instead of one file at the end
+                const response = await fetch('/convert?stream=1', {
                     method: 'POST',
                     body: formData
                 });
                 
-                if (response.ok) {
-                    // Get the file content as a Blob
-                    const blob = await response.blob();
-                    
-                    // Create a URL for the Blob
-                    const fileURL = URL.createObjectURL(blob);
-                    
-                    // Set the download link properties
-                    downloadAnchor.href = fileURL;
-                    
-                    // Display the success message and download link
-                    statusDiv.textContent = 'Conversion successful!';
-                    downloadLinkDiv.style.display = 'block';
-
-                    // Optional: Clean up the blob URL after a short delay
-                    setTimeout(() => URL.revokeObjectURL(fileURL), 30000); 
-
-                } else {
+                if (!response.ok) {
                     const errorText = await response.text();
                     statusDiv.textContent = 'Error: ' + errorText;
+                    return;
+                }
+
+                const bands = [];
+                const handleEvent = (e) => {
+                    if (e.event === 'progress' && e.stage === 'queued') {
+                        statusDiv.textContent = 'Processing... Please wait.';
+                    } else if (e.event === 'progress') {
+                        statusDiv.textContent = `Reading the table (0 of ${e.bands} parts done)...`;
+                    } else if (e.event === 'rows') {
+                        bands[e.band] = e.rows;
+                        renderPreview(bands);
+                        statusDiv.textContent = `Reading the table (${e.done} of ${e.bands} parts done)...`;
+                    } else if (e.event === 'done') {
+                        // The workbook is kept on the server, link to it instead of downloading a blob
+                        downloadAnchor.href = e.result_url;
+                        statusDiv.textContent = `Conversion successful! ${e.rows} rows found.`;
+                        downloadLinkDiv.style.display = 'block';
+                    } else if (e.event === 'error') {
+                        statusDiv.textContent = 'Error: ' + e.error;
+                    }
+                };
+
+                // Split the byte stream into lines, one JSON event per line
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\\n');
+                    buffer = lines.pop();
+                    for (const line of lines) {
+                        if (line.trim()) handleEvent(JSON.parse(line));
+                    }
                 }
             } catch (error) {
                 statusDiv.textContent = 'Network Error: ' + error.message;
@@ -99,6 +166,94 @@ HTML_TEMPLATE = """
 </html>
 """
 
+def send_export(pages, fmt, basename, layout='sheets'):
+    """
+    Sends parsed pages as a download in the negotiated format.
+    CSV is streamed chunk by chunk; xlsx and parquet are written into a spooled
+    temp file and sent from there, never as a DataFrame or a whole BytesIO copy.
+    """
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = export_pages(pages, fmt, layout=layout)
+    if fmt == 'csv':
+        # The rows are written while the response is sent, so that is when
+        # the export stage is timed
+        g.streamed = True
+        return Response(timed_iter(body, g.timings, 'export'), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename={basename}{extension}'
+        })
+    return send_file(
+        body,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=basename + extension
+    )
+
+def wants_stream():
+    """True if the client asked for NDJSON progress instead of the file."""
+    if request.values.get('stream') in ('1', 'true'):
+        return True
+    # Only an explicit Accept entry counts, */* must keep getting the file
+    return any(value == NDJSON_MIMETYPE and quality > 0 for value, quality in request.accept_mimetypes)
+
+def stream_conversion(data, filename, fmt):
+    """Runs the conversion as a job and streams its events as NDJSON lines."""
+    job_id, events = job_queue.stream(data, filename)
+    result_url = url_for('job_result', job_id=job_id, format=fmt)
+
+    def generate():
+        for event in events:
+            if event['event'] == 'done':
+                event['result_url'] = result_url
+            yield json.dumps(event) + '\n'
+
+    # No buffering anywhere on the way, or the rows would not arrive early
+    g.streamed = True
+    return Response(generate(), mimetype=NDJSON_MIMETYPE,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.before_request
+def start_request_timer():
+    g.start = time.perf_counter()
+    g.timings = {}  # app-side stages; the OCR workers report their own
+    g.stats = None  # stats of a fresh OCR result, for the slow-request log
+    g.streamed = False  # the body is generated while it is sent (CSV, NDJSON)
+
+@app.after_request
+def record_request_metrics(response):
+    # Copied out of the request context, which is gone by the time a
+    # streamed body has been sent
+    start, timings, stats = g.start, g.timings, g.stats
+    endpoint, method, path = request.endpoint, request.method, request.path
+
+    def record():
+        elapsed = time.perf_counter() - start
+        if endpoint and endpoint != 'prometheus_metrics':
+            metrics.observe_request(endpoint, elapsed)
+            metrics.observe_stages(timings)
+        if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+            ocr_stats = stats or {}
+            app.logger.warning(
+                'Slow request: %s %s took %.2fs, stages=%s, image=%sx%s, table=%sx%s',
+                method, path, elapsed,
+                {stage: round(seconds, 3) for stage, seconds in dict(ocr_stats.get('timings', {}), **timings).items()},
+                ocr_stats.get('width'), ocr_stats.get('height'), ocr_stats.get('rows'), ocr_stats.get('columns'))
+
+    if g.streamed:
+        # Only finished once the server has sent the last chunk and closes the body
+        response.call_on_close(record)
+    else:
+        record()
+    return response
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return f'File too large, the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB', 413
+
+@app.errorhandler(QueueFull)
+def ocr_saturated(e):
+    """Every OCR worker is busy and the queue is full: ask the client to back off."""
+    return 'Too many conversions in progress, try again shortly', 429, {'Retry-After': str(e.retry_after)}
+
 @app.route('/')
 def index():
     """Renders the HTML form."""
@@ -106,68 +261,162 @@ def index():
 
 @app.route('/convert', methods=['POST'])
 def convert_image_to_excel():
-    """Handles file upload, OCR, and Excel conversion/download."""
+    """
+    Handles file upload, OCR, and Excel conversion/download.
+    Pass format=csv or format=parquet (or an Accept header) for other formats.
+    With stream=1 (or Accept: application/x-ndjson) the response is NDJSON
+    instead: progress events and each band's rows as soon as they are OCR'd,
+    ending with a 'done' event whose result_url serves the file.
+    """
     if 'file' not in request.files:
         return 'No file part', 400
     file = request.files['file']
     if file.filename == '':
         return 'No selected file', 400
+    try:
+        fmt = negotiate_format(request.values.get('format'), request.accept_mimetypes)
+    except ValueError as e:
+        return str(e), 400
     
+    try:
+        data = read_upload(file)
+    except UploadRejected as e:
+        return str(e), e.status
+    # Everything so far (multipart parsing + read) counts as reading the upload
+    g.timings['upload_read'] = time.perf_counter() - g.start
+
+    if wants_stream():
+        return stream_conversion(data, file.filename, fmt)
+
     if file:
         try:
-            # 1. Image Processing with PIL
-            img = Image.open(file.stream)
-            
-            # 2. OCR with Tesseract
-            # Use 'psm 6' (Assume a single uniform block of text) and 'TESSDATA_CONFIG' for table-specific settings
-            # The 'preserve_interword_spaces=False' is often helpful for structured data
-            text = pytesseract.image_to_string(img, config='--psm 6')
-            
-            # 3. Simple Table Conversion (The most complex and error-prone step)
-            # This is a basic attempt. Real table extraction is much harder!
-            
-            # Split the text into lines
-            lines = text.strip().split('\n')
-            
-            # Simple assumption: data is separated by tabs/spaces or a consistent delimiter
-            # We'll treat the output as a single block of text and try to parse it.
-            # A common simple method is to create a list of lists (rows of cells)
-            data = []
-            for line in lines:
-                # Basic attempt to split based on multiple spaces (common in tables)
-                # This is highly unreliable and depends heavily on the image quality/structure.
-                cells = [cell.strip() for cell in line.split('  ') if cell.strip()] 
-                if cells:
-                    data.append(cells)
-            
-            # Find the maximum number of columns for consistent dataframe creation
-            max_cols = max(len(row) for row in data) if data else 0
-            
-            # Pad shorter rows to match the max columns
-            padded_data = [row + [''] * (max_cols - len(row)) for row in data]
-
-            # 4. Create a DataFrame and Excel file in memory
-            df = pd.DataFrame(padded_data)
-            
-            # Use io.BytesIO to keep the file in memory
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, header=False, sheet_name='Extracted Data')
-            
-            output.seek(0) # Go back to the start of the stream
+            # 1.-3. Decode, clean up, OCR and parse the image on a warm OCR worker
+            # (answered straight from the OCR cache for images seen before)
+            result = job_queue.run(data)
+            g.stats = result.get('stats')
+            padded_data = result['rows']
 
-            # 5. Return the file for download
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name='converted_table.xlsx' # The filename for the download
-            )
+            # 4. Write the rows straight into the export file and return it for download
+            with timed(g.timings, 'export'):
+                return send_export([('Extracted Data', padded_data)], fmt, 'converted_table')
 
+        except QueueFull:
+            raise
         except Exception as e:
             # Catch errors during processing
             return str(e), 500
 
+@app.route('/convert/batch', methods=['POST'])
+def convert_batch_to_excel():
+    """
+    Converts a ZIP of images or a multi-page TIFF into a single workbook.
+    Pages are OCR'd in parallel on the job queue's worker pool.
+    Use ?layout=concat to put every page on one sheet instead of one sheet per page.
+    """
+    if 'file' not in request.files:
+        return 'No file part', 400
+    file = request.files['file']
+    if file.filename == '':
+        return 'No selected file', 400
+
+    layout = request.values.get('layout', 'sheets')
+    if layout not in ('sheets', 'concat'):
+        return "layout must be 'sheets' or 'concat'", 400
+    try:
+        fmt = negotiate_format(request.values.get('format'), request.accept_mimetypes)
+    except ValueError as e:
+        return str(e), 400
+
+    try:
+        data = read_upload(file, allow_archives=True)
+        pages = split_pages(data, file.filename)
+        if not pages:
+            return 'No images found in upload', 400
+        for content in {id(content): content for _, content, _ in pages}.values():
+            check_image(content)
+    except UploadRejected as e:
+        return str(e), e.status
+    except Exception as e:
+        return str(e), 400
+
+    g.timings['upload_read'] = time.perf_counter() - g.start
+
+    try:
+        pages = job_queue.extract_pages(pages)
+        with timed(g.timings, 'export'):
+            return send_export(pages, fmt, 'converted_tables', layout=layout)
+
+    except QueueFull:
+        raise
+    except Exception as e:
+        return str(e), 500
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queues an uploaded image for OCR and returns the job id straight away."""
+    if 'file' not in request.files:
+        return 'No file part', 400
+    file = request.files['file']
+    if file.filename == '':
+        return 'No selected file', 400
+
+    try:
+        data = read_upload(file)
+    except UploadRejected as e:
+        return str(e), e.status
+    g.timings['upload_read'] = time.perf_counter() - g.start
+
+    job_id = job_queue.submit(data, filename=file.filename)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id),
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Reports whether a job is queued, running, done or failed."""
+    info = job_queue.status(job_id)
+    if info is None:
+        return 'Unknown job', 404
+    return jsonify(info)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Downloads the Excel (or ?format=csv/parquet) file of a finished job."""
+    try:
+        fmt = negotiate_format(request.values.get('format'), request.accept_mimetypes)
+    except ValueError as e:
+        return str(e), 400
+    info = job_queue.status(job_id)
+    if info is None:
+        return 'Unknown job', 404
+    if info['status'] == 'failed':
+        return info['error'], 500
+    if info['status'] != 'done':
+        return jsonify(info), 409
+
+    with timed(g.timings, 'export'):
+        return send_export([('Extracted Data', job_queue.result(job_id))], fmt, 'converted_table')
+
+@app.route('/health')
+def health():
+    """Pings the OCR worker pool; 503 if it is broken, 200 with status 'busy' if it is only behind."""
+    info = job_queue.check_health()
+    return jsonify(info), 200 if info['ok'] else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency, image size and table size histograms in Prometheus text format."""
+    counters = {f'ocr_cache_{name}': value for name, value in ocr_cache.info().items()}
+    counters.update({f'ocr_queue_{name}': value for name, value in job_queue.load_info().items()})
+    return Response(metrics.render(counters), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters of the OCR result cache."""
+    return jsonify(ocr_cache.info())
+
 if __name__ == '__main__':
     # Run the Flask app
     app.run(debug=True) # Run with 'debug=True' for development
\ No newline at end of file
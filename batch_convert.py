@@ -0,0 +1,225 @@
+"""
+Command-line batch converter: OCRs every image under a directory into one
+spreadsheet per image, in parallel, without going through the web app.
+
+    python batch_convert.py scans/ tables/
+    python batch_convert.py scans/ tables/ --format csv --workers 8
+    python batch_convert.py scans/ tables/ --force     # redo everything
+
+The output tree mirrors the input tree (scans/2023/a.png -> tables/2023/a.xlsx);
+when two sources differ only in their extension (a.png and a.jpg) both keep
+it (a.png.xlsx, a.jpg.xlsx) so neither overwrites the other. A source already
+in the manifest keeps the output name recorded there, so adding a.jpg next to
+a converted a.png leaves a.xlsx in place and names the new file a.jpg.xlsx.
+A multi-page TIFF becomes one workbook with a sheet per page. Every finished
+file is appended to a manifest (OUT_DIR/.batch_manifest.jsonl by default), so
+an interrupted run picks up where it stopped, and files whose output is up to
+date (same source size and mtime, same format and OCR settings) are skipped.
+Failed files are recorded too and retried on the next run.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from exporters import EXPORT_FORMATS, write_export
+from ingest import check_image
+from ocr_engine import warm_up
+from ocr_jobs import worker_context
+from ocr_pipeline import IMAGE_EXTENSIONS, OCR_CONFIG, ocr_signature, run_ocr, split_pages
+
+MANIFEST_NAME = '.batch_manifest.jsonl'
+
+
+def convert_file(source, target, fmt='xlsx', layout='sheets'):
+    """
+    OCRs one image file (every frame of a multi-page TIFF) and writes the
+    table to `target`. Runs in a worker process.
+
+    The output is written to a temporary name and renamed into place, so an
+    interrupted run never leaves a truncated file that looks finished.
+
+    Returns:
+        dict: {'pages': number of pages, 'rows': total table rows}
+    """
+    with open(source, 'rb') as f:
+        data = f.read()
+    check_image(data)
+    pages = split_pages(data, os.path.basename(source))
+    tables = [(label, run_ocr(content, OCR_CONFIG, frame)['rows']) for label, content, frame in pages]
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    partial = f'{target}.{os.getpid()}.part'
+    with open(partial, 'wb') as f:
+        write_export(tables, fmt, f, layout)
+    os.replace(partial, target)
+    return {'pages': len(pages), 'rows': sum(len(rows) for _, rows in tables)}
+
+
+def find_images(root):
+    """Relative paths of all image files under `root`, sorted."""
+    found = []
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(folder, name), root))
+    return found
+
+
+def output_names(sources, extension, recorded=None):
+    """
+    Maps every source to its output path. Sources that would share an output
+    name keep their own extension in it; names compare case-insensitively,
+    as they do on Windows and macOS file systems.
+
+    Args:
+        sources (list): Relative source paths.
+        extension (str): Output extension, e.g. '.xlsx'.
+        recorded (dict): {source: output} from an earlier run. These sources
+            keep that name (if it has `extension`), so a file's output does
+            not move when another source with the same stem turns up later.
+
+    Returns:
+        tuple: ({source: output}, [groups of sources that still clash])
+    """
+    recorded = recorded or {}
+    outputs = {source: recorded[source] for source in sources
+               if (recorded.get(source) or '').lower().endswith(extension)}
+    taken = {output.lower() for output in outputs.values()}
+    by_stem = {}
+    for source in sources:
+        by_stem.setdefault(os.path.splitext(source)[0].lower(), []).append(source)
+    for group in by_stem.values():
+        for source in group:
+            if source in outputs:
+                continue
+            plain = os.path.splitext(source)[0] + extension
+            keep = len(group) > 1 or plain.lower() in taken
+            outputs[source] = (source if keep else os.path.splitext(source)[0]) + extension
+    by_output = {}
+    for source, output in outputs.items():
+        by_output.setdefault(output.lower(), []).append(source)
+    return outputs, [group for group in by_output.values() if len(group) > 1]
+
+
+def load_manifest(path):
+    """
+    Reads the manifest into {source: last entry}. A line cut short by a crash
+    is ignored; that file is simply converted again.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['source']] = entry
+    return entries
+
+
+def write_manifest(path, entries):
+    """Rewrites the manifest with one line per source (drops superseded lines)."""
+    partial = path + '.part'
+    with open(partial, 'w', encoding='utf-8') as f:
+        for entry in entries.values():
+            f.write(json.dumps(entry) + '\n')
+    os.replace(partial, path)
+
+
+def is_up_to_date(entry, stat, signature, target):
+    """True if `target` was produced from this exact source with these settings."""
+    if entry is None:
+        # No record (e.g. the manifest was deleted): fall back to comparing mtimes
+        return os.path.exists(target) and os.stat(target).st_mtime_ns >= stat.st_mtime_ns
+    return (entry.get('status') == 'done'
+            and entry.get('size') == stat.st_size
+            and entry.get('mtime_ns') == stat.st_mtime_ns
+            and entry.get('signature') == signature
+            and os.path.exists(target))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a directory of table images to spreadsheets.')
+    parser.add_argument('input_dir', help='directory to scan (recursively) for images')
+    parser.add_argument('output_dir', help='where to write the spreadsheets')
+    parser.add_argument('--format', default='xlsx', choices=list(EXPORT_FORMATS))
+    parser.add_argument('--layout', default='sheets', choices=['sheets', 'concat'],
+                        help='xlsx only: one sheet per TIFF page, or all pages on one sheet')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='OCR processes')
+    parser.add_argument('--manifest', default=None, help=f'manifest path (default OUTPUT_DIR/{MANIFEST_NAME})')
+    parser.add_argument('--force', action='store_true', help='convert every file, even if up to date')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f'{args.input_dir} is not a directory')
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(args.output_dir, MANIFEST_NAME)
+    entries = load_manifest(manifest_path)
+    write_manifest(manifest_path, entries)
+
+    extension = EXPORT_FORMATS[args.format][1]
+    signature = f'{args.format}|{args.layout}|{ocr_signature()}'
+    todo = []
+    sources = find_images(args.input_dir)
+    outputs, clashes = output_names(sources, extension,
+                                    {source: entry.get('output') for source, entry in entries.items()})
+    if clashes:
+        parser.error('these files would overwrite each other: '
+                     + '; '.join(', '.join(group) for group in clashes))
+    for source in sources:
+        path = os.path.join(args.input_dir, source)
+        output = outputs[source]
+        stat = os.stat(path)
+        if not args.force and is_up_to_date(entries.get(source), stat, signature,
+                                            os.path.join(args.output_dir, output)):
+            continue
+        todo.append((source, output, stat))
+    print(f'{len(sources)} images found, {len(sources) - len(todo)} up to date, {len(todo)} to convert')
+    if not todo:
+        return 0
+
+    failed = 0
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=warm_up,
+                                   initargs=(OCR_CONFIG,), mp_context=worker_context())
+    try:
+        with open(manifest_path, 'a', encoding='utf-8') as manifest:
+            futures = {}
+            for source, output, stat in todo:
+                future = executor.submit(convert_file, os.path.join(args.input_dir, source),
+                                         os.path.join(args.output_dir, output), args.format, args.layout)
+                futures[future] = (source, output, stat)
+
+            for done, future in enumerate(as_completed(futures), 1):
+                source, output, stat = futures[future]
+                entry = {'source': source, 'output': output, 'size': stat.st_size,
+                         'mtime_ns': stat.st_mtime_ns, 'signature': signature}
+                try:
+                    entry.update(future.result(), status='done')
+                except Exception as e:
+                    failed += 1
+                    entry.update(status='failed', error=str(e) or type(e).__name__)
+                entry['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                manifest.write(json.dumps(entry) + '\n')
+                manifest.flush()
+                detail = entry.get('error') or f"{entry['rows']} rows"
+                print(f'[{done}/{len(todo)}] {source}: {entry["status"]} ({detail})')
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print('Interrupted; run the same command again to resume.')
+        return 130
+    executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f'Converted {len(todo) - failed} files in {elapsed:.1f}s, {failed} failed')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,416 @@
+"""
+Offline benchmark / load test for the image-to-Excel pipeline.
+
+Generates synthetic table images with PIL (known cell contents, so accuracy
+can be scored too), pushes them through the pipeline and writes a JSON report
+that can be compared between runs:
+
+    python benchmark_ocr.py                       # all modes, default sizes
+    python benchmark_ocr.py --modes load --concurrency 8 --images 64
+    python benchmark_ocr.py --output bench/before.json
+
+Modes:
+    pipeline  run_ocr() directly in this process (no Flask, no worker pool)
+    convert   POST /convert one request at a time through the Flask test client
+    load      POST /convert from --concurrency threads at once
+
+The corpus is written to a temporary directory by a child process, and each
+mode runs in a fresh copy of this script that reads the images back one by
+one, so neither the corpus nor another mode sets a mode's memory figures:
+peak_rss_mb is the mode process's own peak, and peak_rss_workers_mb the
+largest combined RSS of its OCR pool processes, sampled while it runs.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+FONT_CANDIDATES = ('DejaVuSans.ttf', 'arial.ttf', 'LiberationSans-Regular.ttf', 'Helvetica.ttc')
+TITLES = ('Monthly statement of account for customer', 'Quarterly sales by region',
+          'Inventory count as of end of period')
+
+
+def load_font(size, index=0):
+    """Returns a TrueType font if one can be found, else Pillow's built-in font."""
+    for name in FONT_CANDIDATES[index:] + FONT_CANDIDATES[:index]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def random_cell(rng, col):
+    # First column reads like a label, the others like numbers
+    if col == 0:
+        return rng.choice(string.ascii_uppercase) + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8)))
+    return f'{rng.randint(0, 9999)}.{rng.randint(0, 99):02d}' if rng.random() < 0.5 else str(rng.randint(0, 999))
+
+
+def make_table_image(rows=10, cols=4, font_size=28, noise=0.0, scale=1.0, skew=0.0,
+                     fmt='PNG', font_index=0, seed=0, title=False, row_spacing=2.0):
+    """
+    Draws a table of random cells on a white page.
+
+    Args:
+        rows, cols (int): Table shape.
+        font_size (int): Text size in px at scale 1.
+        noise (float): Std-dev of Gaussian pixel noise (0-255 scale).
+        scale (float): Resolution multiplier, e.g. 3.0 for phone-photo sizes.
+        skew (float): Rotation in degrees.
+        fmt (str): 'PNG' or 'JPEG'.
+        font_index (int): Which of FONT_CANDIDATES to try first.
+        seed (int): Seed for the cell contents.
+        title (bool): Put a one-cell title line above the table, as most
+            real statements and reports have.
+        row_spacing (float): Row pitch in multiples of the font size.
+
+    Returns:
+        tuple: (encoded image bytes, cells as a list of rows; the title, if
+        any, is a first row with one cell)
+    """
+    rng = random.Random(seed)
+    cells = [[random_cell(rng, c) for c in range(cols)] for _ in range(rows)]
+    if title:
+        cells.insert(0, [rng.choice(TITLES)])
+
+    font = load_font(int(font_size * scale), font_index)
+    col_width = int(font_size * 9 * scale)
+    row_height = int(font_size * row_spacing * scale)
+    margin = int(font_size * 2 * scale)
+    img = Image.new('RGB', (2 * margin + cols * col_width, 2 * margin + len(cells) * row_height), 'white')
+    draw = ImageDraw.Draw(img)
+    for r, row in enumerate(cells):
+        for c, text in enumerate(row):
+            draw.text((margin + c * col_width, margin + r * row_height), text, font=font, fill='black')
+
+    if skew:
+        img = img.rotate(skew, expand=True, fillcolor='white')
+    if noise:
+        pixels = np.asarray(img, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise, pixels.shape)
+        img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, quality=90) if fmt == 'JPEG' else img.save(buffer, fmt)
+    return buffer.getvalue(), cells
+
+
+def make_corpus(count, seed=0):
+    """A mix of shapes, fonts, noise levels and resolutions, generated one image at a time."""
+    rng = random.Random(seed)
+    for i in range(count):
+        params = {
+            'rows': rng.choice([5, 10, 20, 40]),
+            'cols': rng.choice([2, 3, 4, 6]),
+            'font_size': rng.choice([20, 28, 36]),
+            'noise': rng.choice([0.0, 0.0, 8.0, 20.0]),
+            'scale': rng.choice([1.0, 1.0, 2.0, 3.0]),
+            'skew': rng.choice([0.0, 0.0, 1.0, -2.0]),
+            'fmt': rng.choice(['PNG', 'JPEG']),
+            'font_index': rng.randrange(len(FONT_CANDIDATES)),
+            'seed': seed * 100003 + i,
+            'title': rng.random() < 0.5,
+            'row_spacing': rng.choice([2.0, 2.0, 2.5, 3.0]),
+        }
+        data, cells = make_table_image(**params)
+        yield {'params': params, 'data': data, 'cells': cells}
+
+
+def write_corpus(directory, count, seed=0):
+    """Saves make_corpus() to `directory`: one file per image plus index.json."""
+    index = []
+    for i, item in enumerate(make_corpus(count, seed)):
+        path = os.path.join(directory, f'{i:04d}.img')
+        with open(path, 'wb') as f:
+            f.write(item['data'])
+        index.append({'params': item['params'], 'cells': item['cells'], 'path': path})
+    with open(os.path.join(directory, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+
+
+def read_corpus(directory):
+    """The index written by write_corpus(); each item's image is read from item['path'] when needed."""
+    with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_image(item):
+    with open(item['path'], 'rb') as f:
+        return f.read()
+
+
+def cell_accuracy(expected, rows):
+    """Share of expected cells found in the right (row, column) position."""
+    total = sum(len(row) for row in expected)
+    hits = 0
+    for r, row in enumerate(expected):
+        for c, text in enumerate(row):
+            if r < len(rows) and c < len(rows[r]) and rows[r][c].strip() == text:
+                hits += 1
+    return hits / total if total else 0.0
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, in MB (None where unsupported)."""
+    try:
+        # Unlike ru_maxrss, VmHWM starts over when a process execs
+        with open('/proc/self/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1)
+
+
+def _descendants(pid):
+    """PIDs of every process below `pid`, read from /proc (empty elsewhere)."""
+    children = {}
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else ():
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='utf-8') as f:
+                # "pid (comm) state ppid ...", and comm may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm', encoding='utf-8') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class WorkerRSSSampler:
+    """
+    Samples the combined RSS of this process's descendants (the OCR pool
+    workers and their forkserver) in a background thread. ru_maxrss cannot
+    give this: RUSAGE_CHILDREN only covers children that have already exited.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, sum(_rss_bytes(pid) for pid in _descendants(os.getpid())))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if os.path.isdir('/proc') else None
+
+
+def summarize(latencies, wall_seconds, accuracies, errors):
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        k = min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies) + 0.5)) - 1))
+        return round(latencies[k], 4)
+
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_per_second': round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+        'latency_seconds': {
+            'mean': round(statistics.fmean(latencies), 4) if latencies else None,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': round(latencies[-1], 4) if latencies else None,
+        },
+        'cell_accuracy': round(statistics.fmean(accuracies), 4) if accuracies else None,
+    }
+
+
+def bench_pipeline(corpus):
+    from ocr_pipeline import run_ocr
+
+    latencies, accuracies, errors = [], [], 0
+    start = time.perf_counter()
+    for item in corpus:
+        t = time.perf_counter()
+        try:
+            rows = run_ocr(read_image(item))['rows']
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t)
+        accuracies.append(cell_accuracy(item['cells'], rows))
+    return summarize(latencies, time.perf_counter() - start, accuracies, errors)
+
+
+def bench_http(client, corpus, concurrency):
+    latencies, accuracies = [], []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one(item):
+        t = time.perf_counter()
+        response = client.post('/convert?format=csv',
+                               data={'file': (io.BytesIO(read_image(item)), 'bench.png')})
+        body = response.get_data(as_text=True)
+        elapsed = time.perf_counter() - t
+        with lock:
+            if response.status_code != 200:
+                errors[0] += 1
+                return
+            latencies.append(elapsed)
+            rows = [line.split(',') for line in body.splitlines()]
+            accuracies.append(cell_accuracy(item['cells'], rows))
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for item in corpus:
+            one(item)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, corpus))
+    return summarize(latencies, time.perf_counter() - start, accuracies, errors[0])
+
+
+def run_mode(mode, corpus_dir, concurrency, use_cache):
+    """Runs one mode over the corpus in `corpus_dir`; called in a fresh process by main()."""
+    corpus = read_corpus(corpus_dir)
+    extra = {}
+    with WorkerRSSSampler() as workers:
+        if mode == 'pipeline':
+            result = bench_pipeline(corpus)
+        else:
+            import app as ocr_app
+            if not use_cache:
+                ocr_app.job_queue.cache = None
+            ocr_app.job_queue.check_health()  # start (and warm) the worker pool before timing
+            client = ocr_app.app.test_client()
+            result = bench_http(client, corpus, 1 if mode == 'convert' else concurrency)
+            extra['ocr_workers'] = ocr_app.job_queue.max_workers
+            ocr_app.job_queue.shutdown()
+    result['peak_rss_mb'] = peak_rss_mb()
+    result['peak_rss_workers_mb'] = workers.peak_mb
+    result.update(extra)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the image-to-Excel pipeline.')
+    parser.add_argument('--images', type=int, default=24, help='synthetic images per mode')
+    parser.add_argument('--modes', default='pipeline,convert,load', help='comma-separated: pipeline,convert,load')
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 2, help='threads for the load mode')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--use-cache', action='store_true', help='keep the OCR result cache on (off by default)')
+    parser.add_argument('--output', default=None, help='JSON report path (default bench_results/ocr-<time>.json)')
+    # Internal: write the corpus, or run a single mode and write its result as JSON
+    parser.add_argument('--write-corpus', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    parser.add_argument('--corpus-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.write_corpus:
+        write_corpus(args.corpus_dir, args.images, args.seed)
+        return
+    if args.run_mode:
+        result = run_mode(args.run_mode, args.corpus_dir, args.concurrency, args.use_cache)
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    for mode in modes:
+        if mode not in ('pipeline', 'convert', 'load'):
+            parser.error(f'unknown mode {mode!r}')
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'images': args.images,
+        'seed': args.seed,
+        'concurrency': args.concurrency,
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix='ocr-bench-') as corpus_dir:
+        print(f'Generating {args.images} synthetic table images...')
+        # In a child: the largest images take far more memory to draw than
+        # any mode needs, and would otherwise be every mode's starting peak
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--write-corpus', '--corpus-dir', corpus_dir,
+                        '--images', str(args.images), '--seed', str(args.seed)], check=True)
+        for mode in modes:
+            print(f'Running {mode}...')
+            result_file = os.path.join(corpus_dir, f'{mode}.json')
+            command = [sys.executable, os.path.abspath(__file__), '--run-mode', mode,
+                       '--corpus-dir', corpus_dir, '--result-file', result_file,
+                       '--concurrency', str(args.concurrency)]
+            if args.use_cache:
+                command.append('--use-cache')
+            subprocess.run(command, check=True)
+            with open(result_file, encoding='utf-8') as f:
+                result = json.load(f)
+            if 'ocr_workers' in result:
+                report['ocr_workers'] = result.pop('ocr_workers')
+            report['results'][mode] = result
+            latency = result['latency_seconds']
+            print(f"  {result['throughput_per_second']} img/s, p50 {latency['p50']}s, p95 {latency['p95']}s, "
+                  f"p99 {latency['p99']}s, accuracy {result['cell_accuracy']}, errors {result['errors']}, "
+                  f"peak RSS {result['peak_rss_mb']} MB (+ workers {result['peak_rss_workers_mb']} MB)")
+
+    output = args.output or os.path.join('bench_results', time.strftime('ocr-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {output}')
+
+
+if __name__ == '__main__':
+    main()
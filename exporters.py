@@ -0,0 +1,193 @@
+import csv
+import io
+import re
+import tempfile
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# format name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'xlsx': (XLSX_MIMETYPE, '.xlsx'),
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+# Files bigger than this are spooled to a temp file on disk instead of RAM
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def preload():
+    """
+    Imports the export libraries now instead of on the first download. Call
+    it in a master process before it forks web workers (e.g. gunicorn
+    --preload) so they share the loaded modules instead of each importing them.
+    pyarrow is skipped when it is not installed.
+    """
+    import xlsxwriter
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        pass
+
+
+def negotiate_format(requested=None, accept_mimetypes=None):
+    """
+    Picks the export format from an explicit `format=` value, falling back to
+    the request's Accept header and then to xlsx.
+
+    Args:
+        requested (str): Value of the `format` query/form field, if any.
+        accept_mimetypes: werkzeug MIMEAccept of the request, if any.
+
+    Returns:
+        str: One of the EXPORT_FORMATS keys.
+
+    Raises:
+        ValueError: If `requested` names an unsupported format.
+    """
+    if requested:
+        fmt = requested.lower().lstrip('.')
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format '{requested}', use one of: {', '.join(EXPORT_FORMATS)}")
+        return fmt
+
+    if accept_mimetypes:
+        by_mimetype = {mimetype: fmt for fmt, (mimetype, _) in EXPORT_FORMATS.items()}
+        best = accept_mimetypes.best_match(list(by_mimetype))
+        # A bare */* (what browsers send) matches the first entry, which is xlsx
+        if best:
+            return by_mimetype[best]
+    return 'xlsx'
+
+
+def concat_pages(pages):
+    """Yields the rows of every page in order, padded to one common width."""
+    max_cols = max((len(row) for _, rows in pages for row in rows), default=0)
+    for _, rows in pages:
+        for row in rows:
+            yield row + [''] * (max_cols - len(row))
+
+
+def iter_csv(rows, chunk_size=64 * 1024):
+    """
+    Streams rows as CSV text in chunks of roughly `chunk_size` characters,
+    so the response never holds more than one chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _sheet_name(label, used):
+    # Excel sheet names: max 31 chars, no []:*?/\ and unique within the workbook
+    base = re.sub(r'[\[\]:*?/\\]', '_', label)[:31] or 'Sheet'
+    name, n = base, 1
+    while name.lower() in used:
+        n += 1
+        suffix = f' ({n})'
+        name = base[:31 - len(suffix)] + suffix
+    used.add(name.lower())
+    return name
+
+
+def write_xlsx(pages, fileobj):
+    """
+    Writes one worksheet per (label, rows) page straight into `fileobj`.
+
+    xlsxwriter's constant_memory mode flushes every finished row to a temp
+    file, so memory stays flat no matter how many rows a page has.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True, 'strings_to_numbers': False})
+    used = set()
+    for label, rows in pages:
+        worksheet = workbook.add_worksheet(_sheet_name(label, used))
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                if cell != '':
+                    worksheet.write_string(r, c, cell)
+    workbook.close()
+
+
+def write_parquet(rows, fileobj, batch_size=10000):
+    """
+    Writes rows as a Parquet file of string columns col_0..col_N, one row
+    group per `batch_size` rows. Needs pyarrow, which is optional.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        columns = list(zip(*batch))
+        table = pa.table({f'col_{i}': pa.array(col, type=pa.string()) for i, col in enumerate(columns)})
+        if writer is None:
+            writer = pq.ParquetWriter(fileobj, table.schema)
+        writer.write_table(table)
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if writer is None:
+        # Empty table: still produce a valid (zero-column) Parquet file
+        pq.write_table(pa.table({}), fileobj)
+    else:
+        writer.close()
+
+
+def export_pages(pages, fmt, layout='sheets'):
+    """
+    Renders parsed pages in the requested format.
+
+    Args:
+        pages (list): (label, rows) pairs in page order.
+        fmt (str): One of the EXPORT_FORMATS keys.
+        layout (str): 'sheets' (one sheet per page) or 'concat'. Only xlsx has
+            sheets, csv and parquet are always concatenated.
+
+    Returns:
+        A generator of CSV text chunks for csv, otherwise a file object
+        (spooled to disk when large) rewound to the start.
+    """
+    if fmt == 'csv':
+        return iter_csv(concat_pages(pages))
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    write_export(pages, fmt, output, layout)
+    output.seek(0)
+    return output
+
+
+def write_export(pages, fmt, fileobj, layout='sheets'):
+    """
+    Writes parsed pages in the requested format into a binary file object,
+    e.g. a file on disk. Arguments as for export_pages().
+    """
+    if fmt == 'csv':
+        for chunk in iter_csv(concat_pages(pages)):
+            fileobj.write(chunk.encode('utf-8'))
+    elif fmt == 'parquet':
+        write_parquet(concat_pages(pages), fileobj)
+    elif layout == 'concat':
+        write_xlsx([('Extracted Data', concat_pages(pages))], fileobj)
+    else:
+        write_xlsx(pages, fileobj)
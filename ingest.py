@@ -0,0 +1,98 @@
+import io
+import os
+from PIL import Image
+
+# Hard limits for one upload. MAX_UPLOAD_BYTES is also set as Flask's
+# MAX_CONTENT_LENGTH, so oversized requests are refused before the body is read.
+MAX_UPLOAD_BYTES = int(os.environ.get('OCR_MAX_UPLOAD_MB', 20)) * 1024 * 1024
+MAX_IMAGE_PIXELS = int(os.environ.get('OCR_MAX_IMAGE_PIXELS', 60_000_000))
+# A ZIP is checked against these from its directory, before anything is
+# inflated: a few hundred KB of compressed zeros can expand to gigabytes
+MAX_ARCHIVE_ENTRIES = int(os.environ.get('OCR_MAX_ARCHIVE_ENTRIES', 500))
+MAX_ARCHIVE_BYTES = int(os.environ.get('OCR_MAX_ARCHIVE_MB', 200)) * 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """An upload we refuse to process; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def check_image(data):
+    """
+    Validates an image from its header alone, without decoding any pixels.
+
+    Returns:
+        tuple: (format, (width, height))
+
+    Raises:
+        UploadRejected: 400 for unreadable files, 413 for too many pixels.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise UploadRejected('Image has too many pixels', 413)
+    except Exception:
+        raise UploadRejected('Not a supported image file (PNG/JPG/TIFF)')
+    width, height = img.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise UploadRejected(f'Image is {width}x{height}, the limit is {MAX_IMAGE_PIXELS:,} pixels', 413)
+    return img.format, img.size
+
+
+def check_archive(entries):
+    """
+    Validates the ZIP entries that are about to be read, from their declared
+    sizes alone. zipfile never inflates an entry past its declared size, so
+    these limits hold even for a crafted archive.
+
+    Args:
+        entries (list): zipfile.ZipInfo objects.
+
+    Raises:
+        UploadRejected: 413 for too many entries, an entry larger than
+            MAX_UPLOAD_BYTES or more than MAX_ARCHIVE_BYTES in total.
+    """
+    if len(entries) > MAX_ARCHIVE_ENTRIES:
+        raise UploadRejected(f'Archive has {len(entries)} images, the limit is {MAX_ARCHIVE_ENTRIES}', 413)
+    total = 0
+    for info in entries:
+        if info.file_size > MAX_UPLOAD_BYTES:
+            raise UploadRejected(f'{info.filename} is too large once unpacked, '
+                                 f'the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB', 413)
+        total += info.file_size
+    if total > MAX_ARCHIVE_BYTES:
+        raise UploadRejected(f'Archive is too large once unpacked, '
+                             f'the limit is {MAX_ARCHIVE_BYTES // (1024 * 1024)} MB', 413)
+
+
+def read_upload(file, allow_archives=False):
+    """
+    Reads an uploaded file into one bytes object and validates it.
+
+    Werkzeug has already spooled large parts to a temp file, so this is the
+    only copy made: decode_image() wraps these bytes in a BytesIO, which
+    shares the buffer instead of copying it, and the worker pool pickles it
+    straight into its pipe.
+
+    Args:
+        file (FileStorage): The upload from request.files.
+        allow_archives (bool): Skip the image check (batch uploads may be ZIPs).
+
+    Returns:
+        bytes: The file content.
+
+    Raises:
+        UploadRejected: If the file is too big or not a usable image.
+    """
+    # Read one byte past the limit so a body without Content-Length cannot slip through
+    data = file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise UploadRejected(f'File too large, the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB', 413)
+    if not data:
+        raise UploadRejected('Uploaded file is empty')
+    if not allow_archives:
+        check_image(data)
+    return data
@@ -0,0 +1,195 @@
+"""
+A* search over a CSRGraph with pluggable heuristics.
+
+A heuristic is any callable h(node, target) -> lower bound on the cost from
+`node` to `target` (both int ids). With h = 0 A* is exactly Dijkstra; the
+better the bound, the fewer nodes are expanded. Two are built in:
+
+    StraightLine   Euclidean distance between node coordinates
+    Landmarks      ALT: triangle-inequality bounds from precomputed
+                   distances to and from a few landmark nodes
+"""
+import math
+from heapq import heappop, heappush
+
+from csr_graph import CSRGraph
+from dijkstra import INF, build_path, shortest_paths
+from maps import romania_coordinates, romania_map
+
+
+def zero_heuristic(node, target):
+    return 0.0
+
+
+class StraightLine:
+    """
+    Straight-line distance heuristic from {name: (x, y)} coordinates.
+
+    The distance is multiplied by `scale`, which must keep it at or below the
+    real edge costs for A* to stay optimal. By default the largest safe scale
+    is derived from the graph: the smallest weight / distance ratio over all
+    edges (1.0 for the Romania map, whose roads are never shorter than the
+    straight line).
+    """
+
+    def __init__(self, g, coordinates, scale=None):
+        self.x = [float(coordinates[name][0]) for name in g.names]
+        self.y = [float(coordinates[name][1]) for name in g.names]
+        self.scale = admissible_scale(g, self.x, self.y) if scale is None else scale
+
+    def __call__(self, node, target):
+        return self.scale * math.hypot(self.x[node] - self.x[target], self.y[node] - self.y[target])
+
+
+def admissible_scale(g, x, y):
+    """Largest factor for which scale * Euclidean distance never exceeds an edge weight."""
+    scale = INF
+    for u in range(len(g)):
+        for v, w in g.neighbors(u):
+            d = math.hypot(x[u] - x[v], y[u] - y[v])
+            if d > 0:
+                scale = min(scale, w / d)
+    return 1.0 if scale == INF else scale
+
+
+class Landmarks:
+    """
+    ALT heuristic. For every landmark L the distances from L and to L are
+    computed once, then for any node v and target t:
+
+        d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+
+    and the heuristic is the best such bound over all landmarks. Landmarks
+    are picked far apart (each one the node farthest from those already
+    chosen), which gives the tightest bounds.
+    """
+
+    def __init__(self, g, count=4, landmarks=None):
+        reverse = g.reversed()
+        if landmarks is None:
+            landmarks = self.pick_landmarks(g, count)
+        self.landmarks = list(landmarks)
+        self.from_landmark = [shortest_paths(g, L)[0] for L in self.landmarks]
+        self.to_landmark = [shortest_paths(reverse, L)[0] for L in self.landmarks]
+
+    @staticmethod
+    def pick_landmarks(g, count):
+        """Farthest-point selection, starting from the node farthest from node 0."""
+        closest = shortest_paths(g, 0)[0]  # distance to the nearest landmark so far
+        chosen = []
+        for _ in range(min(count, len(g))):
+            # Nodes the search cannot reach (INF) are left out
+            candidates = [(d, v) for v, d in enumerate(closest) if d != INF and v not in chosen]
+            if not candidates:
+                break
+            far = max(candidates)[1]
+            dist = shortest_paths(g, far)[0]
+            closest = dist if not chosen else [min(a, b) for a, b in zip(closest, dist)]
+            chosen.append(far)
+        return chosen
+
+    def __call__(self, node, target):
+        best = 0.0
+        for d_from, d_to in zip(self.from_landmark, self.to_landmark):
+            a, b = d_from[target], d_from[node]
+            if a != INF and b != INF and a - b > best:
+                best = a - b
+            a, b = d_to[node], d_to[target]
+            if a != INF and b != INF and a - b > best:
+                best = a - b
+        return best
+
+
+def astar_ids(g, source, target, heuristic=zero_heuristic):
+    """
+    A* over int node ids, with parent pointers and lazy deletion.
+
+    Nodes are re-opened when a cheaper way to them turns up, so an admissible
+    heuristic that is not consistent still gives optimal costs.
+
+    Returns:
+        tuple: (path as list of ids or None, cost, nodes expanded)
+    """
+    offsets, heads, weights = g.offsets, g.targets, g.weights
+    dist = {source: 0.0}
+    parent = {source: -1}
+    heap = [(heuristic(source, target), 0.0, source)]
+    expanded = 0
+
+    while heap:
+        _, d, u = heappop(heap)
+        if d > dist[u]:
+            continue  # stale entry
+        expanded += 1
+        if u == target:
+            return build_path(parent, target), d, expanded
+        for i in range(offsets[u], offsets[u + 1]):
+            v = heads[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                parent[v] = u
+                heappush(heap, (nd + heuristic(v, target), nd, v))
+    return None, INF, expanded
+
+
+def astar(graph, start, target, heuristic=zero_heuristic):
+    """
+    Cheapest path between two named nodes.
+
+    Args:
+        graph: A CSRGraph or any lab graph dict. Pass a CSRGraph when the
+            heuristic was built for one, so the node ids agree.
+        start (str): Starting node.
+        target (str): Target node.
+        heuristic (callable): h(node id, target id) -> admissible lower bound.
+
+    Returns:
+        tuple: (path as list, total cost, nodes expanded), path None if unreachable.
+    """
+    g = CSRGraph.from_any(graph)
+    path, cost, expanded = astar_ids(g, g.id(start), g.id(target), heuristic)
+    return (g.path_names(path) if path else None), cost, expanded
+
+
+def compare_expansions(g, pairs, heuristics):
+    """
+    Runs Dijkstra (stopping at the target) and A* with every heuristic on each
+    (start, target) pair of names and reports the nodes each one expanded.
+
+    Returns:
+        list: One dict per pair: {'start', 'target', 'cost', 'dijkstra': n,
+        <heuristic name>: n, ...}.
+    """
+    report = []
+    for start, target in pairs:
+        s, t = g.id(start), g.id(target)
+        dist, _, expanded = shortest_paths(g, s, [t])
+        row = {'start': start, 'target': target, 'cost': dist[t], 'dijkstra': expanded}
+        for name, heuristic in heuristics.items():
+            _, cost, expanded = astar_ids(g, s, t, heuristic)
+            assert cost == dist[t], f'{name} returned {cost}, expected {dist[t]}'
+            row[name] = expanded
+        report.append(row)
+    return report
+
+
+def main():
+    romania = CSRGraph.from_dict_of_dicts(romania_map)
+    sld = StraightLine(romania, romania_coordinates)
+    alt = Landmarks(romania, count=3)
+    print("Landmarks:", ', '.join(romania.path_names(alt.landmarks)), f"(SLD scale {sld.scale:.3f})")
+
+    path, cost, expanded = astar(romania, 'Arad', 'Bucharest', sld)
+    print(f"A* Arad → Bucharest: {' → '.join(path)}, cost {cost:g}, {expanded} nodes expanded")
+
+    pairs = [('Arad', 'Bucharest'), ('Timisoara', 'Iasi'), ('Oradea', 'Eforie'), ('Neamt', 'Drobeta')]
+    report = compare_expansions(romania, pairs, {'a*-sld': sld, 'a*-alt': alt})
+    print(f"\n{'route':<24}{'cost':>6}{'dijkstra':>10}{'a*-sld':>8}{'a*-alt':>8}")
+    for row in report:
+        route = f"{row['start']} → {row['target']}"
+        print(f"{route:<24}{row['cost']:>6g}{row['dijkstra']:>10}{row['a*-sld']:>8}{row['a*-alt']:>8}")
+
+
+if __name__ == "__main__":
+    main()
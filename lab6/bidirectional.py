@@ -0,0 +1,169 @@
+"""
+Bidirectional searches for single point-to-point queries.
+
+Both run one search forward from the start and one backward from the goal
+(over the reversed edges, so directed graphs work too) and stop once the two
+can no longer improve on the best meeting point found. Each side only has to
+reach about half the depth, which for a branching factor b means roughly
+b^(d/2) explored nodes per side instead of b^d.
+"""
+from collections import deque
+from heapq import heappop, heappush
+
+from csr_graph import CSRGraph
+from dijkstra import INF, shortest_paths
+from maps import graph, romania_map
+
+
+def _join(parent_f, parent_b, meet):
+    """Path start -> meet from the forward parents, then meet -> goal from the backward ones."""
+    path = []
+    node = meet
+    while node != -1:
+        path.append(node)
+        node = parent_f[node]
+    path.reverse()
+    node = parent_b[meet]
+    while node != -1:
+        path.append(node)
+        node = parent_b[node]
+    return path
+
+
+def bidirectional_bfs(g, start, goal, reverse=None):
+    """
+    Fewest-edges path between two node ids, expanding one whole BFS level at a
+    time on whichever side has the smaller frontier.
+
+    Args:
+        g (CSRGraph): The graph (weights are ignored).
+        start (int): Start node id.
+        goal (int): Goal node id.
+        reverse (CSRGraph): g.reversed(), if already built.
+
+    Returns:
+        tuple: (path as list of ids or None, nodes expanded)
+    """
+    if start == goal:
+        return [start], 0
+    reverse = reverse or g.reversed()
+    parents = ({start: -1}, {goal: -1})
+    depths = ({start: 0}, {goal: 0})
+    frontiers = (deque([start]), deque([goal]))
+    graphs = (g, reverse)
+    expanded = 0
+
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        frontier, parent, depth = frontiers[side], parents[side], depths[side]
+        other_depth = depths[1 - side]
+        offsets, heads = graphs[side].offsets, graphs[side].targets
+
+        # Expand the whole level before stopping: a meeting found early in the
+        # level is not necessarily the shortest one
+        best, meet = INF, -1
+        for _ in range(len(frontier)):
+            u = frontier.popleft()
+            expanded += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = heads[i]
+                if v not in parent:
+                    parent[v] = u
+                    depth[v] = depth[u] + 1
+                    frontier.append(v)
+                if v in other_depth and depth[v] + other_depth[v] < best:
+                    best, meet = depth[v] + other_depth[v], v
+        if meet != -1:
+            return _join(parents[0], parents[1], meet), expanded
+    return None, expanded
+
+
+def bidirectional_dijkstra(g, start, goal, reverse=None):
+    """
+    Cheapest path between two node ids. The side whose heap top is lower is
+    advanced one node at a time; every edge that reaches a node the other
+    side has already labelled is a candidate meeting point, and the search
+    stops once top(forward) + top(backward) >= the best candidate.
+
+    Returns:
+        tuple: (path as list of ids or None, cost, nodes expanded)
+    """
+    if start == goal:
+        return [start], 0.0, 0
+    reverse = reverse or g.reversed()
+    dists = ({start: 0.0}, {goal: 0.0})
+    parents = ({start: -1}, {goal: -1})
+    heaps = ([(0.0, start)], [(0.0, goal)])
+    graphs = (g, reverse)
+    best, meet = INF, -1
+    expanded = 0
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        dist, parent, other = dists[side], parents[side], dists[1 - side]
+        d, u = heappop(heaps[side])
+        if d > dist[u]:
+            continue  # stale entry
+        expanded += 1
+        offsets, heads, weights = graphs[side].offsets, graphs[side].targets, graphs[side].weights
+        for i in range(offsets[u], offsets[u + 1]):
+            v = heads[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                parent[v] = u
+                heappush(heaps[side], (nd, v))
+            if v in other and dist[v] + other[v] < best:
+                best, meet = dist[v] + other[v], v
+
+    if meet == -1:
+        return None, INF, expanded
+    return _join(parents[0], parents[1], meet), best, expanded
+
+
+def bfs(g, start, goal):
+    """One-directional BFS for comparison (parent pointers, like lab5/BFSDtoG.py)."""
+    parent = {start: -1}
+    queue = deque([start])
+    expanded = 0
+    while queue:
+        u = queue.popleft()
+        expanded += 1
+        if u == goal:
+            path = []
+            while u != -1:
+                path.append(u)
+                u = parent[u]
+            return path[::-1], expanded
+        for v, _ in g.neighbors(u):
+            if v not in parent:
+                parent[v] = u
+                queue.append(v)
+    return None, expanded
+
+
+def main():
+    small = CSRGraph.from_adjacency_lists(graph)
+    path, expanded = bidirectional_bfs(small, small.id('D'), small.id('G'))
+    print(f"Bidirectional BFS D → G: {' -> '.join(small.path_names(path))} ({expanded} nodes expanded)")
+
+    romania = CSRGraph.from_dict_of_dicts(romania_map)
+    reverse = romania.reversed()
+    print(f"\n{'route':<24}{'bfs':>5}{'bi-bfs':>8}{'cost':>6}{'dijkstra':>10}{'bi-dijkstra':>13}")
+    for start, goal in [('Arad', 'Bucharest'), ('Timisoara', 'Iasi'), ('Oradea', 'Eforie'), ('Neamt', 'Drobeta')]:
+        s, t = romania.id(start), romania.id(goal)
+        _, bfs_expanded = bfs(romania, s, t)
+        _, bi_bfs_expanded = bidirectional_bfs(romania, s, t, reverse)
+        _, cost, bi_expanded = bidirectional_dijkstra(romania, s, t, reverse)
+        dist, _, expanded = shortest_paths(romania, s, [t])
+        assert cost == dist[t]
+        print(f"{start + ' → ' + goal:<24}{bfs_expanded:>5}{bi_bfs_expanded:>8}{cost:>6g}{expanded:>10}{bi_expanded:>13}")
+
+    path, cost, _ = bidirectional_dijkstra(romania, romania.id('Arad'), romania.id('Bucharest'), reverse)
+    print(f"\nArad → Bucharest: {' → '.join(romania.path_names(path))}, cost {cost:g}")
+
+
+if __name__ == "__main__":
+    main()
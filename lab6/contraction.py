@@ -0,0 +1,449 @@
+"""
+Contraction hierarchy (CH) for fast point-to-point route queries.
+
+Preprocessing contracts the nodes one by one, least important first. When a
+node v is removed, every pair of neighbours u -> v -> x whose shortest
+connection ran through v gets a shortcut edge u -> x (remembering v, so the
+real path can be unpacked later). A query is then a bidirectional Dijkstra
+that only follows edges towards more important nodes, which on road graphs
+settles a few hundred nodes instead of a large part of the map.
+
+    python contraction.py                         # demo on the Romania map
+    python contraction.py build romania.ch        # preprocess and save
+    python contraction.py build --graph roads.txt roads.ch
+    python contraction.py serve romania.ch --port 8765
+
+`--graph` takes a lab graph dict saved as JSON (any format CSRGraph.from_any
+reads) or a text edge list with one "source target [weight]" per line; the
+Romania map is used without it. The server answers
+GET /route?from=Arad&to=Bucharest with JSON.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+from array import array
+from heapq import heapify, heappop, heappush
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from csr_graph import CSRGraph
+from dijkstra import INF, shortest_paths
+from maps import romania_map
+
+MAGIC = b'CH1\n'
+# A witness search gives up after settling this many nodes and adds the
+# shortcut anyway (an unneeded shortcut costs a little speed, never correctness)
+WITNESS_SETTLE_LIMIT = 500
+
+
+def _witness_cost(out, source, skip, limit):
+    """
+    Costs from `source` to the nodes around it in the remaining graph, without
+    passing through `skip` and not looking past cost `limit`.
+    """
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > limit:
+            break
+        settled += 1
+        for v, (w, _) in out[u].items():
+            nd = d + w
+            if v != skip and nd < dist.get(v, INF):
+                dist[v] = nd
+                heappush(heap, (nd, v))
+    return dist
+
+
+def _shortcuts(out, inn, v):
+    """The shortcuts contracting v would need: (u, x, weight) triples."""
+    needed = []
+    outgoing = [(x, w) for x, (w, _) in out[v].items()]
+    if not outgoing:
+        return needed
+    for u, (w_in, _) in inn[v].items():
+        limit = w_in + max(w for _, w in outgoing)
+        witness = _witness_cost(out, u, v, limit)
+        for x, w_out in outgoing:
+            if x != u and witness.get(x, INF) > w_in + w_out:
+                needed.append((u, x, w_in + w_out))
+    return needed
+
+
+def _priority(out, inn, v, contracted_neighbours):
+    # Edge difference plus the number of already contracted neighbours, which
+    # spreads the contraction evenly over the graph
+    return (len(_shortcuts(out, inn, v)) - len(out[v]) - len(inn[v])
+            + contracted_neighbours[v])
+
+
+def _csr(n, edges):
+    """(offsets, targets, weights, via) arrays from (source, target, weight, via) tuples."""
+    edges.sort(key=lambda e: e[0])
+    offsets = array('q', bytes(8 * (n + 1)))
+    for source, _, _, _ in edges:
+        offsets[source + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    return (offsets, array('i', (e[1] for e in edges)), array('d', (e[2] for e in edges)),
+            array('i', (e[3] for e in edges)))
+
+
+class ContractionHierarchy:
+    """
+    A contracted graph: `up` holds, for every node, its edges to more
+    important nodes, `down` its incoming edges from more important nodes
+    (stored reversed, ready for the backward search). `up_via` / `down_via`
+    give the contracted middle node of each shortcut, -1 for original edges.
+    """
+
+    def __init__(self, names, rank, up, up_via, down, down_via):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.rank = rank
+        self.up, self.up_via = up, up_via
+        self.down, self.down_via = down, down_via
+
+    @classmethod
+    def build(cls, graph):
+        """
+        Contracts every node of `graph` (a CSRGraph or any lab graph dict).
+
+        Nodes are taken in order of their priority, re-checked lazily: the
+        popped node's priority is recomputed and it is pushed back if it is no
+        longer the smallest.
+        """
+        g = CSRGraph.from_any(graph)
+        n = len(g)
+        out = [dict() for _ in range(n)]  # u -> {x: (weight, via)}
+        inn = [dict() for _ in range(n)]  # x -> {u: (weight, via)}
+        for u in range(n):
+            for x, w in g.neighbors(u):
+                if u != x and w < out[u].get(x, (INF,))[0]:
+                    out[u][x] = inn[x][u] = (w, -1)
+
+        contracted_neighbours = [0] * n
+        heap = [(_priority(out, inn, v, contracted_neighbours), v) for v in range(n)]
+        heapify(heap)
+        rank = array('i', [0] * n)
+        up_edges, down_edges = [], []
+        order = 0
+        while heap:
+            _, v = heappop(heap)
+            priority = _priority(out, inn, v, contracted_neighbours)
+            if heap and priority > heap[0][0]:
+                heappush(heap, (priority, v))
+                continue
+
+            for u, x, w in _shortcuts(out, inn, v):
+                if w < out[u].get(x, (INF,))[0]:
+                    out[u][x] = inn[x][u] = (w, v)
+            # Every remaining neighbour is contracted later, so it ranks higher
+            for x, (w, via) in out[v].items():
+                up_edges.append((v, x, w, via))
+                del inn[x][v]
+                contracted_neighbours[x] += 1
+            for u, (w, via) in inn[v].items():
+                down_edges.append((v, u, w, via))
+                del out[u][v]
+                contracted_neighbours[u] += 1
+            out[v], inn[v] = {}, {}
+            rank[v] = order
+            order += 1
+
+        names = list(g.names)
+        up, up_via = cls._graph(names, up_edges)
+        down, down_via = cls._graph(names, down_edges)
+        return cls(names, rank, up, up_via, down, down_via)
+
+    @staticmethod
+    def _graph(names, edges):
+        offsets, targets, weights, via = _csr(len(names), edges)
+        return CSRGraph(names, offsets, targets, weights), via
+
+    # --- Queries -----------------------------------------------------------
+
+    def query_ids(self, s, t):
+        """
+        Bidirectional upward Dijkstra between node ids.
+
+        Returns:
+            tuple: (cost, meeting node id, forward parents, backward parents);
+            cost is INF and the meeting node -1 if t is unreachable.
+        """
+        dists = ({s: 0.0}, {t: 0.0})
+        parents = ({s: -1}, {t: -1})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        graphs = (self.up, self.down)
+        best, meet = (0.0, s) if s == t else (INF, -1)
+
+        while True:
+            # Advance the side with the lower heap top; a side whose top can
+            # no longer beat the best meeting is done
+            tops = [h[0][0] if h and h[0][0] < best else INF for h in heaps]
+            if tops[0] == INF and tops[1] == INF:
+                break
+            side = 0 if tops[0] <= tops[1] else 1
+            dist, parent, other = dists[side], parents[side], dists[1 - side]
+            d, u = heappop(heaps[side])
+            if d > dist[u]:
+                continue
+            if u in other and d + other[u] < best:
+                best, meet = d + other[u], u
+            g = graphs[side]
+            for i in range(g.offsets[u], g.offsets[u + 1]):
+                v = g.targets[i]
+                nd = d + g.weights[i]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    parent[v] = u
+                    heappush(heaps[side], (nd, v))
+        return best, meet, parents[0], parents[1]
+
+    def _via(self, a, b):
+        """Middle node of the edge a -> b (-1 for an original edge)."""
+        if self.rank[a] < self.rank[b]:
+            g, via, source, target = self.up, self.up_via, a, b
+        else:
+            g, via, source, target = self.down, self.down_via, b, a
+        best_w, best_via = INF, -1
+        for i in range(g.offsets[source], g.offsets[source + 1]):
+            if g.targets[i] == target and g.weights[i] < best_w:
+                best_w, best_via = g.weights[i], via[i]
+        return best_via
+
+    def _unpack(self, a, b, path):
+        """Appends the original nodes of edge a -> b (without a) to path."""
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._via(a, b)
+            if middle == -1:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def route(self, start, target, with_path=True):
+        """
+        Cheapest route between two named nodes.
+
+        Returns:
+            tuple: (path as list of names or None, total cost). The path is
+            only unpacked when `with_path` is set.
+        """
+        s, t = self.ids[start], self.ids[target]
+        cost, meet, parent_f, parent_b = self.query_ids(s, t)
+        if meet == -1:
+            return None, INF
+        if not with_path:
+            return None, cost
+        # Upward edges s .. meet, then the backward tree meet .. t
+        hops = []
+        node = meet
+        while parent_f[node] != -1:
+            hops.append((parent_f[node], node))
+            node = parent_f[node]
+        hops.reverse()
+        node = meet
+        while parent_b[node] != -1:
+            hops.append((node, parent_b[node]))
+            node = parent_b[node]
+        path = [s]
+        for a, b in hops:
+            self._unpack(a, b, path)
+        return [self.names[v] for v in path], cost
+
+    # --- Storage -----------------------------------------------------------
+
+    def save(self, path):
+        """Writes the hierarchy as a JSON header followed by the raw arrays."""
+        arrays = [self.rank,
+                  self.up.offsets, self.up.targets, self.up.weights, self.up_via,
+                  self.down.offsets, self.down.targets, self.down.weights, self.down_via]
+        header = json.dumps({
+            'names': self.names,
+            'arrays': [[a.typecode, len(a)] for a in arrays],
+            'byteorder': sys.byteorder,
+        }).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for a in arrays:
+                a.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a contraction hierarchy file')
+            (length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length))
+            arrays = []
+            for typecode, count in header['arrays']:
+                a = array(typecode)
+                a.fromfile(f, count)
+                if header['byteorder'] != sys.byteorder:
+                    a.byteswap()
+                arrays.append(a)
+        names = header['names']
+        rank, up_offsets, up_targets, up_weights, up_via, down_offsets, down_targets, down_weights, down_via = arrays
+        return cls(names, rank,
+                   CSRGraph(names, up_offsets, up_targets, up_weights), up_via,
+                   CSRGraph(names, down_offsets, down_targets, down_weights), down_via)
+
+
+def make_handler(ch):
+    """A request handler class serving routes from `ch`."""
+
+    class RouteHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path == '/health':
+                return self.send_json(200, {'ok': True, 'nodes': len(ch.names)})
+            if url.path != '/route':
+                return self.send_json(404, {'error': 'use /route?from=A&to=B'})
+            missing = [name for name in ('from', 'to') if name not in params]
+            if missing:
+                return self.send_json(400, {'error': f"missing parameter: {', '.join(missing)}"})
+            start, target = params['from'], params['to']
+            if start not in ch.ids or target not in ch.ids:
+                return self.send_json(400, {'error': f'unknown node: {start if start not in ch.ids else target}'})
+            began = time.perf_counter()
+            path, cost = ch.route(start, target, with_path=params.get('path', '1') != '0')
+            micros = (time.perf_counter() - began) * 1e6
+            self.send_json(200, {'from': start, 'to': target, 'cost': None if cost == INF else cost,
+                                 'path': path, 'micros': round(micros, 1)})
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # one line per query would slow the server down
+
+    return RouteHandler
+
+
+def serve(ch, host='127.0.0.1', port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(ch))
+    print(f"Serving {len(ch.names)} nodes on http://{host}:{port}/route?from=...&to=...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def demo():
+    romania = CSRGraph.from_dict_of_dicts(romania_map)
+    ch = ContractionHierarchy.build(romania)
+    shortcuts = sum(1 for v in list(ch.up_via) + list(ch.down_via) if v != -1)
+    print(f"Contracted {len(ch.names)} nodes, {shortcuts} shortcuts added")
+
+    for start in romania_map:
+        dist = shortest_paths(romania, romania.id(start))[0]
+        for target in romania_map:
+            path, cost = ch.route(start, target)
+            assert cost == dist[romania.id(target)], (start, target)
+            assert sum(romania_map[a][b] for a, b in zip(path, path[1:])) == cost
+    print("All 400 routes match Dijkstra")
+
+    path, cost = ch.route('Arad', 'Bucharest')
+    print(f"Arad → Bucharest: {' → '.join(path)}, cost {cost:g}")
+
+    queries = [(a, b) for a in romania_map for b in romania_map] * 25
+    began = time.perf_counter()
+    for a, b in queries:
+        ch.route(a, b, with_path=False)
+    ch_micros = (time.perf_counter() - began) / len(queries) * 1e6
+    began = time.perf_counter()
+    for a, b in queries:
+        shortest_paths(romania, romania.id(a), [romania.id(b)])
+    dijkstra_micros = (time.perf_counter() - began) / len(queries) * 1e6
+    print(f"Per query: CH {ch_micros:.1f} µs, Dijkstra {dijkstra_micros:.1f} µs")
+
+
+def load_graph(path, undirected=False):
+    """
+    Reads a graph to contract from a file.
+
+    Args:
+        path (str): A .json file holding a lab graph dict, or a text edge
+            list: one "source target [weight]" per line (weight 1 if left
+            out), blank lines and lines starting with # skipped.
+        undirected (bool): Add target -> source for every edge-list line.
+
+    Returns:
+        CSRGraph: The graph.
+
+    Raises:
+        ValueError: If a line of an edge list cannot be read.
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return CSRGraph.from_any(json.load(f))
+    edges = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) not in (2, 3):
+                raise ValueError(f'{path}:{number}: expected "source target [weight]"')
+            try:
+                weight = float(fields[2]) if len(fields) == 3 else 1.0
+            except ValueError:
+                raise ValueError(f'{path}:{number}: bad weight {fields[2]!r}') from None
+            if weight < 0:
+                raise ValueError(f'{path}:{number}: negative weight')
+            edges.append((fields[0], fields[1], weight))
+            if undirected:
+                edges.append((fields[1], fields[0], weight))
+    return CSRGraph.from_edges(edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contraction hierarchy build and route server.')
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help='contract a graph (the Romania map by default) and save it')
+    build.add_argument('output')
+    build.add_argument('--graph', help='lab graph dict as .json, or a "source target [weight]" edge list')
+    build.add_argument('--undirected', action='store_true', help='edge list lines are two-way roads')
+    server = commands.add_parser('serve', help='answer /route queries from a saved hierarchy')
+    server.add_argument('input')
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        graph = romania_map
+        if args.graph:
+            try:
+                graph = load_graph(args.graph, args.undirected)
+            except (OSError, ValueError) as e:
+                parser.error(str(e))
+        ch = ContractionHierarchy.build(graph)
+        ch.save(args.output)
+        print(f"Saved {len(ch.names)} nodes to {args.output}")
+    elif args.command == 'serve':
+        serve(ContractionHierarchy.load(args.input), args.host, args.port)
+    else:
+        demo()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Compact graph core shared by the lab 6 search scripts.
+
+Node names are interned to ints 0..n-1 and the adjacency is stored in
+compressed sparse row (CSR) form in flat `array` buffers: the neighbours of
+node u are targets[offsets[u]:offsets[u + 1]], their edge weights sit at the
+same positions in `weights`. Compared with a dict of dicts of strings this
+needs a few bytes per edge instead of a few hundred, and a scan over a node's
+neighbours reads one contiguous block of memory.
+
+Adapters build a CSRGraph from every graph format used in the earlier labs.
+"""
+import sys
+from array import array
+
+from maps import graph, node_graph, romania_edges, romania_map
+
+
+class CSRGraph:
+    """
+    Immutable directed, weighted graph in CSR form.
+
+    Undirected graphs are stored with both directions of every edge, which is
+    what the lab dicts already do.
+    """
+
+    def __init__(self, names, offsets, targets, weights):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.offsets = offsets    # array('q'), n + 1 entries
+        self.targets = targets    # array('i'), one entry per edge
+        self.weights = weights    # array('d'), one entry per edge
+
+    @classmethod
+    def from_edges(cls, edges, names=()):
+        """
+        Builds the graph from (source, target, weight) triples of node names.
+
+        Args:
+            edges (iterable): (source, target, weight) triples.
+            names (iterable): Nodes to intern first, in this order (isolated
+                nodes only show up here).
+
+        Returns:
+            CSRGraph: The graph; edges keep their input order within each node.
+        """
+        ids = {}
+        order = []
+
+        def intern(name):
+            i = ids.get(name)
+            if i is None:
+                i = ids[name] = len(order)
+                order.append(name)
+            return i
+
+        for name in names:
+            intern(name)
+        sources = array('i')
+        targets = array('i')
+        weights = array('d')
+        for source, target, weight in edges:
+            sources.append(intern(source))
+            targets.append(intern(target))
+            weights.append(weight)
+        return cls._from_arrays(order, sources, targets, weights)
+
+    @classmethod
+    def _from_arrays(cls, names, sources, targets, weights):
+        # Counting sort of the edges by source node, O(n + m)
+        n = len(names)
+        offsets = array('q', bytes(8 * (n + 1)))
+        for s in sources:
+            offsets[s + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        position = array('q', offsets[:n])
+        sorted_targets = array('i', bytes(4 * len(targets)))
+        sorted_weights = array('d', bytes(8 * len(weights)))
+        for s, t, w in zip(sources, targets, weights):
+            p = position[s]
+            sorted_targets[p] = t
+            sorted_weights[p] = w
+            position[s] = p + 1
+        return cls(names, offsets, sorted_targets, sorted_weights)
+
+    # --- Adapters from the lab formats ------------------------------------
+
+    @classmethod
+    def from_adjacency_lists(cls, adjacency):
+        """{Node: [Neighbor, ...]} (lab5/BFSDtoG.py), every edge weighing 1."""
+        return cls.from_edges(((u, v, 1) for u, vs in adjacency.items() for v in vs), adjacency)
+
+    @classmethod
+    def from_weighted_lists(cls, adjacency):
+        """{Node: [(Neighbor, weight), ...]} (LAB3/TASK1Cost.py)."""
+        return cls.from_edges(((u, v, w) for u, vs in adjacency.items() for v, w in vs), adjacency)
+
+    @classmethod
+    def from_dict_of_dicts(cls, adjacency):
+        """{Node: {Neighbor: weight, ...}} (lab5/Task1.py)."""
+        return cls.from_edges(((u, v, w) for u, vs in adjacency.items() for v, w in vs.items()), adjacency)
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """{name: Node} with Node.actions listing the neighbours (lab5/activity.py), weight 1."""
+        return cls.from_edges(((u, v, 1) for u, node in nodes.items() for v in node.actions), nodes)
+
+    @classmethod
+    def from_any(cls, adjacency):
+        """Picks the right adapter by looking at the first non-empty entry of `adjacency`."""
+        if isinstance(adjacency, cls):
+            return adjacency
+        # An empty neighbour collection says nothing about the format
+        first = next((vs for vs in adjacency.values() if hasattr(vs, 'actions') or vs), [])
+        if hasattr(first, 'actions'):
+            return cls.from_nodes(adjacency)
+        if isinstance(first, dict):
+            return cls.from_dict_of_dicts(adjacency)
+        if first and isinstance(first[0], (tuple, list)):
+            return cls.from_weighted_lists(adjacency)
+        return cls.from_adjacency_lists(adjacency)
+
+    # --- Queries -----------------------------------------------------------
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def id(self, name):
+        """The int id of a node name (KeyError if unknown)."""
+        return self.ids[name]
+
+    def name(self, node):
+        return self.names[node]
+
+    def degree(self, node):
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def neighbors(self, node):
+        """(neighbour id, weight) pairs of an int node id."""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def edge_weight(self, u, v):
+        """Weight of the edge u -> v (ids), None if there is none."""
+        for t, w in self.neighbors(u):
+            if t == v:
+                return w
+        return None
+
+    def reversed(self):
+        """The graph with every edge turned around (for backward searches)."""
+        sources = array('i')
+        for u in range(len(self.names)):
+            sources.extend([u] * self.degree(u))
+        return self._from_arrays(self.names, self.targets, sources, self.weights)
+
+    def path_names(self, path):
+        """Converts a list of ids to a list of names."""
+        return [self.names[node] for node in path]
+
+    def to_dict(self):
+        """Back to {Node: {Neighbor: weight}}, e.g. for the networkx plots."""
+        return {self.names[u]: {self.names[v]: w for v, w in self.neighbors(u)}
+                for u in range(len(self.names))}
+
+    def memory_bytes(self):
+        """Bytes held by the CSR arrays (the name table not included)."""
+        return sum(a.itemsize * len(a) for a in (self.offsets, self.targets, self.weights))
+
+
+def dict_graph_bytes(adjacency):
+    """Rough deep size of a dict-of-dicts graph, for comparison."""
+    total = sys.getsizeof(adjacency)
+    for node, neighbors in adjacency.items():
+        total += sys.getsizeof(node) + sys.getsizeof(neighbors)
+        for neighbor, weight in neighbors.items():
+            total += sys.getsizeof(neighbor) + sys.getsizeof(weight)
+    return total
+
+
+def main():
+    formats = {
+        'dict of lists (lab5/BFSDtoG.py)': graph,
+        'dict of (neighbor, weight) lists (LAB3/TASK1Cost.py)': romania_edges,
+        'dict of dicts (lab5/Task1.py)': romania_map,
+        'Node objects (lab5/activity.py)': node_graph(),
+    }
+    for label, adjacency in formats.items():
+        g = CSRGraph.from_any(adjacency)
+        print(f'{label}: {len(g)} nodes, {g.edge_count} edges, {g.memory_bytes()} bytes of arrays')
+
+    romania = CSRGraph.from_dict_of_dicts(romania_map)
+    arad = romania.id('Arad')
+    print('Arad ->', [(romania.name(v), w) for v, w in romania.neighbors(arad)])
+    print(f'dict of dicts: ~{dict_graph_bytes(romania_map)} bytes, CSR arrays: {romania.memory_bytes()} bytes')
+    assert romania.to_dict() == {u: {v: float(w) for v, w in vs.items()} for u, vs in romania_map.items()}
+
+
+if __name__ == "__main__":
+    main()
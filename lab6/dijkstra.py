@@ -0,0 +1,144 @@
+"""
+Parent-pointer Dijkstra over a CSRGraph.
+
+Unlike `dijkstra` in LAB3/TASK1Cost.py, the heap only holds (cost, node)
+pairs: each node remembers the node it was reached from, and the path is
+rebuilt once at the end. Entries that went stale because a shorter way to
+their node was found later are skipped when popped (lazy deletion), so no
+decrease-key is needed.
+"""
+from heapq import heappop, heappush
+
+from csr_graph import CSRGraph
+from maps import romania_map
+
+INF = float("inf")
+
+
+def shortest_paths(g, source, targets=None):
+    """
+    Core Dijkstra over int node ids.
+
+    Args:
+        g (CSRGraph): The graph.
+        source (int): Start node id.
+        targets (iterable): Node ids to stop for; the search ends as soon as
+            all of them are settled. None searches the whole graph.
+
+    Returns:
+        tuple: (dist, parent, expanded). dist[v] is the cost from `source`
+        (INF if not reached), parent[v] the previous node on that path (-1 for
+        the source and unreached nodes), expanded the number of nodes settled.
+    """
+    offsets, heads, weights = g.offsets, g.targets, g.weights
+    dist = [INF] * len(g)
+    parent = [-1] * len(g)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    remaining = None if targets is None else set(targets)
+    expanded = 0
+
+    while heap:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue  # stale entry, u was settled at a lower cost
+        expanded += 1
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        for i in range(offsets[u], offsets[u + 1]):
+            v = heads[i]
+            nd = d + weights[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                parent[v] = u
+                heappush(heap, (nd, v))
+    return dist, parent, expanded
+
+
+def build_path(parent, target):
+    """Follows the parent pointers back from `target`; returns ids, source first."""
+    path = []
+    while target != -1:
+        path.append(target)
+        target = parent[target]
+    path.reverse()
+    return path
+
+
+def dijkstra(graph, start, target):
+    """
+    Shortest path by cost between two nodes, stopping once the target is settled.
+
+    Args:
+        graph: A CSRGraph or any lab graph dict (see CSRGraph.from_any).
+        start (str): Starting node.
+        target (str): Target node.
+
+    Returns:
+        tuple: (path as list, total cost), or (None, inf) if unreachable.
+    """
+    g = CSRGraph.from_any(graph)
+    s, t = g.id(start), g.id(target)
+    dist, parent, _ = shortest_paths(g, s, [t])
+    if dist[t] == INF:
+        return None, INF
+    return g.path_names(build_path(parent, t)), dist[t]
+
+
+def dijkstra_all(graph, start):
+    """
+    Costs from `start` to every reachable node.
+
+    Returns:
+        tuple: ({node: cost}, {node: previous node on the shortest path}).
+    """
+    g = CSRGraph.from_any(graph)
+    dist, parent, _ = shortest_paths(g, g.id(start))
+    costs = {g.name(v): d for v, d in enumerate(dist) if d != INF}
+    parents = {g.name(v): g.name(p) for v, p in enumerate(parent) if p != -1}
+    return costs, parents
+
+
+def distance_table(graph, sources, targets):
+    """
+    Many-to-many shortest path costs: one Dijkstra per source, each stopping
+    as soon as every target is settled.
+
+    Args:
+        graph: A CSRGraph or any lab graph dict.
+        sources (list): Origin nodes.
+        targets (list): Destination nodes.
+
+    Returns:
+        dict: {source: {target: cost}}, inf for unreachable pairs.
+    """
+    g = CSRGraph.from_any(graph)
+    target_ids = [g.id(t) for t in targets]
+    table = {}
+    for source in sources:
+        dist, _, _ = shortest_paths(g, g.id(source), target_ids)
+        table[source] = {t: dist[i] for t, i in zip(targets, target_ids)}
+    return table
+
+
+def main():
+    romania = CSRGraph.from_dict_of_dicts(romania_map)
+
+    path, cost = dijkstra(romania, 'Arad', 'Bucharest')
+    print(f"Shortest path from Arad to Bucharest: {' → '.join(path)}")
+    print(f"Total cost: {cost:g}")
+
+    costs, _ = dijkstra_all(romania, 'Arad')
+    print("From Arad:", ', '.join(f"{city} {c:g}" for city, c in sorted(costs.items(), key=lambda x: x[1])))
+
+    cities = ['Arad', 'Bucharest', 'Iasi', 'Timisoara']
+    table = distance_table(romania, cities, cities)
+    print("\n" + " " * 10 + "".join(f"{c:>10}" for c in cities))
+    for source in cities:
+        print(f"{source:<10}" + "".join(f"{table[source][t]:>10g}" for t in cities))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Seeded generators of large synthetic graphs for the lab 6 benchmarks.
+
+Every generator returns an undirected CSRGraph (both directions of each edge
+stored) whose nodes are named 0..n-1. The same (n, seed) always gives the
+same graph.
+
+    grid              4-neighbour lattice, random weights 1..10
+    random_geometric  points in the unit square joined when closer than a
+                      radius chosen for the requested average degree
+    scale_free        Barabasi-Albert preferential attachment (a few hubs
+                      with huge degree, most nodes with m edges)
+    road_like         jittered lattice with missing roads, a few diagonals
+                      and fast "highways" every tenth row and column
+"""
+import math
+import random
+
+from csr_graph import CSRGraph
+
+
+def _undirected(n, edges):
+    """CSRGraph from (u, v, w) triples, adding v -> u for every u -> v."""
+    def both():
+        for u, v, w in edges:
+            yield u, v, w
+            yield v, u, w
+    return CSRGraph.from_edges(both(), names=range(n))
+
+
+def _lattice(n):
+    cols = max(1, math.isqrt(n))
+    return cols, -(-n // cols)
+
+
+def grid(n, seed=0):
+    rng = random.Random(seed)
+    cols, _ = _lattice(n)
+
+    def edges():
+        for u in range(n):
+            if (u + 1) % cols and u + 1 < n:
+                yield u, u + 1, rng.randint(1, 10)
+            if u + cols < n:
+                yield u, u + cols, rng.randint(1, 10)
+    return _undirected(n, edges())
+
+
+def random_geometric(n, seed=0, degree=6):
+    rng = random.Random(seed)
+    x = [rng.random() for _ in range(n)]
+    y = [rng.random() for _ in range(n)]
+    radius = math.sqrt(degree / (math.pi * n))
+    cells = max(1, int(1 / radius))
+    buckets = {}
+    for i in range(n):
+        buckets.setdefault((int(x[i] * cells), int(y[i] * cells)), []).append(i)
+
+    def edges():
+        # Only the 3 x 3 block of cells around a point can hold its neighbours
+        for (cx, cy), members in buckets.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for j in buckets.get((cx + dx, cy + dy), ()):
+                        for i in members:
+                            if i < j:
+                                d = math.hypot(x[i] - x[j], y[i] - y[j])
+                                if d < radius:
+                                    yield i, j, round(d * 1000, 3)
+    return _undirected(n, edges())
+
+
+def scale_free(n, seed=0, m=3):
+    rng = random.Random(seed)
+    m = min(m, max(1, n - 1))
+    # Start from a small clique; every edge end goes into `ends`, so picking
+    # a random entry picks a node with probability proportional to its degree
+    edges = [(u, v, rng.randint(1, 10)) for u in range(m + 1) for v in range(u)]
+    ends = [u for e in edges for u in e[:2]]
+    for u in range(m + 1, n):
+        chosen = set()
+        while len(chosen) < m:
+            chosen.add(rng.choice(ends))
+        for v in chosen:
+            edges.append((u, v, rng.randint(1, 10)))
+            ends.extend((u, v))
+    return _undirected(n, edges)
+
+
+def road_like(n, seed=0, keep=0.85, diagonal=0.1, highway_every=10):
+    rng = random.Random(seed)
+    cols, _ = _lattice(n)
+    x = [u % cols + rng.uniform(-0.3, 0.3) for u in range(n)]
+    y = [u // cols + rng.uniform(-0.3, 0.3) for u in range(n)]
+
+    def cost(u, v, fast):
+        length = math.hypot(x[u] - x[v], y[u] - y[v]) * rng.uniform(1.0, 1.4)
+        return round(length * (0.4 if fast else 1.0) * 100, 1)
+
+    def edges():
+        for u in range(n):
+            row, col = divmod(u, cols)
+            right, down = u + 1, u + cols
+            if col + 1 < cols and right < n and (row % highway_every == 0 or rng.random() < keep):
+                yield u, right, cost(u, right, row % highway_every == 0)
+            if down < n and (col % highway_every == 0 or rng.random() < keep):
+                yield u, down, cost(u, down, col % highway_every == 0)
+            if col + 1 < cols and down + 1 < n and rng.random() < diagonal:
+                yield u, down + 1, cost(u, down + 1, False)
+    return _undirected(n, edges())
+
+
+GENERATORS = {
+    'grid': grid,
+    'random_geometric': random_geometric,
+    'scale_free': scale_free,
+    'road_like': road_like,
+}
+
+
+def main():
+    for name, generate in GENERATORS.items():
+        g = generate(10_000, seed=1)
+        degrees = sorted(g.degree(u) for u in range(len(g)))
+        print(f"{name:<17} {len(g)} nodes, {g.edge_count} edges, "
+              f"degree median {degrees[len(degrees) // 2]}, max {degrees[-1]}")
+
+
+if __name__ == "__main__":
+    main()
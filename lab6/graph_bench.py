@@ -0,0 +1,295 @@
+"""
+Scaling benchmark for the lab search functions on large synthetic graphs.
+
+The searches are taken from the lab scripts themselves (bfs in
+lab5/BFSDtoG.py, DFS in lab5/activity.py, depth_first_search in
+lab5/Task1.py, dijkstra in LAB3/TASK1Cost.py) plus the lab 6 CSR versions.
+Those scripts run a demo and open plot windows on import, so only the
+function definitions are read out of the source with `ast` and executed on
+their own.
+
+Each search runs twice per query: once as written, for the time, and once
+with its frontier (the queue / stack / heap variable) swapped for a list or
+deque that counts pops and its largest size, under tracemalloc for the peak
+memory. A search whose predicted time at the next size exceeds --budget
+is skipped from there on, so the quadratic ones do not stall the run.
+
+    python graph_bench.py                          # 1e3 .. 1e6 nodes
+    python graph_bench.py --sizes 1000,10000 --families grid,scale_free
+    python graph_bench.py --output bench/graphs.json
+"""
+import argparse
+import ast
+import heapq
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from types import SimpleNamespace
+
+from generators import GENERATORS
+from maps import Node
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTIER_NAMES = {'queue', 'stack', 'frontier', 'heap'}
+
+
+# --- Graph formats ---------------------------------------------------------
+
+def as_lists(g):
+    return {u: [v for v, _ in g.neighbors(u)] for u in range(len(g))}
+
+
+def as_weighted_lists(g):
+    return {u: list(g.neighbors(u)) for u in range(len(g))}
+
+
+def as_dicts(g):
+    return {u: dict(g.neighbors(u)) for u in range(len(g))}
+
+
+def as_nodes(g):
+    return {u: Node(u, None, [v for v, _ in g.neighbors(u)], None) for u in range(len(g))}
+
+
+def as_csr(g):
+    return g
+
+
+# --- Loading the lab functions ---------------------------------------------
+
+class _WrapFrontier(ast.NodeTransformer):
+    """Rewrites `stack = [...]` into `stack = _frontier([...])`."""
+
+    def visit_Assign(self, node):
+        if (len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id in FRONTIER_NAMES and isinstance(node.value, ast.List)):
+            node.value = ast.Call(ast.Name('_frontier', ast.Load()), [node.value], [])
+        return node
+
+
+def load_functions(path, names, namespace, probe=False):
+    """
+    Executes only the named top-level functions of a lab script.
+
+    Args:
+        path (str): Script path relative to the repository root.
+        names (list): Functions to take; the last one is returned.
+        namespace (dict): Globals the functions see (imports, graphs).
+        probe (bool): Wrap list frontiers in `_frontier(...)`.
+    """
+    with open(os.path.join(ROOT, path), encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    body = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names]
+    module = ast.Module(body=body, type_ignores=[])
+    if probe:
+        module = _WrapFrontier().visit(module)
+    ast.fix_missing_locations(module)
+    exec(compile(module, path, 'exec'), namespace)
+    return namespace[names[-1]]
+
+
+class Probe:
+    """Counts frontier pops and the largest frontier size during one search."""
+
+    def __init__(self):
+        self.pops = 0
+        self.peak = 0
+        probe = self
+
+        class TrackedList(list):
+            def append(self, item):
+                list.append(self, item)
+                probe.peak = max(probe.peak, len(self))
+
+            def pop(self, *args):
+                probe.pops += 1
+                return list.pop(self, *args)
+
+        class TrackedDeque(deque):
+            def append(self, item):
+                deque.append(self, item)
+                probe.peak = max(probe.peak, len(self))
+
+            def popleft(self):
+                probe.pops += 1
+                return deque.popleft(self)
+
+        def heappush(heap, item):
+            heapq.heappush(heap, item)
+            probe.peak = max(probe.peak, len(heap))
+
+        def heappop(heap):
+            probe.pops += 1
+            return heapq.heappop(heap)
+
+        def frontier(items):
+            probe.peak = max(probe.peak, len(items))
+            return TrackedList(items)
+
+        def make_deque(items=()):
+            d = TrackedDeque(items)
+            probe.peak = max(probe.peak, len(d))
+            return d
+
+        self.namespace = {
+            'deque': make_deque,
+            'heapq': SimpleNamespace(heappush=heappush, heappop=heappop),
+            'heappush': heappush,
+            'heappop': heappop,
+            '_frontier': frontier,
+        }
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+# name: (script, functions, graph format, call(fn, graph, start, goal) -> found)
+IMPLEMENTATIONS = {
+    'bfs': ('lab5/BFSDtoG.py', ['bfs'], as_lists,
+            lambda fn, graph, s, t: fn(graph, s, t)[0] is not None),
+    'DFS': ('lab5/activity.py', ['actionSequence', 'DFS'], as_nodes,
+            lambda fn, graph, s, t: fn(s, t) is not None),
+    'depth_first_search': ('lab5/Task1.py', ['depth_first_search'], as_dicts,
+                           lambda fn, graph, s, t: fn(graph, s, t)[0] != 'Path not found'),
+    'dijkstra': ('LAB3/TASK1Cost.py', ['dijkstra'], as_weighted_lists,
+                 lambda fn, graph, s, t: fn(graph, s, t)[0] is not None),
+    'csr_bfs': ('lab6/bidirectional.py', ['bfs'], as_csr,
+                lambda fn, graph, s, t: fn(graph, s, t)[0] is not None),
+    'csr_dijkstra': ('lab6/dijkstra.py', ['shortest_paths'], as_csr,
+                     lambda fn, graph, s, t: fn(graph, s, [t])[0][t] != math.inf),
+}
+
+
+def run_queries(name, graph, queries):
+    """Times one implementation on `graph` and probes its frontier and memory."""
+    path, functions, _, call = IMPLEMENTATIONS[name]
+    namespace = {'deque': deque, 'heapq': heapq, 'heappush': heapq.heappush, 'heappop': heapq.heappop,
+                 'INF': math.inf, 'print': _quiet, 'graph': graph}
+    fn = load_functions(path, functions, namespace)
+    seconds, found = [], 0
+    for s, t in queries:
+        if name == 'DFS':
+            for node in graph.values():
+                node.parent = None
+        began = time.perf_counter()
+        found += call(fn, graph, s, t)
+        seconds.append(time.perf_counter() - began)
+
+    pops, peak_frontier, peak_memory = [], 0, 0
+    for s, t in queries:
+        if name == 'DFS':
+            for node in graph.values():
+                node.parent = None
+        probe = Probe()
+        probed = load_functions(path, functions, dict(namespace, **probe.namespace), probe=True)
+        tracemalloc.start()
+        call(probed, graph, s, t)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        pops.append(probe.pops)
+        peak_frontier = max(peak_frontier, probe.peak)
+
+    return {
+        'queries': len(queries),
+        'found': found,
+        'mean_seconds': round(sum(seconds) / len(seconds), 6),
+        'max_seconds': round(max(seconds), 6),
+        'mean_expanded': round(sum(pops) / len(pops), 1),
+        'peak_frontier': peak_frontier,
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+def predicted_seconds(history, size):
+    """Extrapolates the time at `size` from the last two sizes (quadratic if only one)."""
+    (n1, t1), = history[-1:]
+    exponent = 2.0
+    if len(history) >= 2:
+        n0, t0 = history[-2]
+        if t0 > 0 and t1 > 0:
+            exponent = max(1.0, math.log(t1 / t0) / math.log(n1 / n0))
+    return t1 * (size / n1) ** exponent
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark for the lab graph searches.')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='comma-separated node counts (1e5 style works too)')
+    parser.add_argument('--families', default=','.join(GENERATORS), help='graph generators to use')
+    parser.add_argument('--implementations', default=','.join(IMPLEMENTATIONS))
+    parser.add_argument('--queries', type=int, default=3, help='random start/goal pairs per graph')
+    parser.add_argument('--budget', type=float, default=20.0,
+                        help='skip a search once its predicted time per query exceeds this many seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='JSON report path (default bench_results/graphs-<time>.json)')
+    args = parser.parse_args()
+
+    sizes = sorted(int(float(s)) for s in args.sizes.split(','))
+    families = args.families.split(',')
+    implementations = args.implementations.split(',')
+    graphs, results = [], []
+
+    print(f"{'family':<17}{'nodes':>9}  {'search':<19}{'ms/query':>10}{'expanded':>12}{'frontier':>10}{'peak KB':>10}")
+    for family in families:
+        history = {name: [] for name in implementations}
+        for size in sizes:
+            began = time.perf_counter()
+            g = GENERATORS[family](size, seed=args.seed)
+            graphs.append({'family': family, 'nodes': len(g), 'edges': g.edge_count,
+                           'build_seconds': round(time.perf_counter() - began, 3),
+                           'csr_bytes': g.memory_bytes()})
+            rng = random.Random(args.seed)
+            queries = [(rng.randrange(len(g)), rng.randrange(len(g))) for _ in range(args.queries)]
+
+            for name in implementations:
+                row = {'family': family, 'nodes': size, 'implementation': name}
+                if history[name] and predicted_seconds(history[name], size) > args.budget:
+                    row['skipped'] = f'predicted {predicted_seconds(history[name], size):.0f}s per query'
+                    results.append(row)
+                    print(f"{family:<17}{size:>9}  {name:<19}{'skipped':>10}")
+                    continue
+                graph = IMPLEMENTATIONS[name][2](g)
+                row.update(run_queries(name, graph, queries))
+                del graph
+                history[name].append((size, row['max_seconds']))
+                results.append(row)
+                print(f"{family:<17}{size:>9}  {name:<19}{row['mean_seconds'] * 1000:>10.2f}"
+                      f"{row['mean_expanded']:>12g}{row['peak_frontier']:>10}{row['peak_memory_kb']:>10g}")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': vars(args),
+        'graphs': graphs,
+        'results': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    output = args.output or os.path.join('bench_results', time.strftime('graphs-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
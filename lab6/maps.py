@@ -0,0 +1,70 @@
+"""
+Sample graphs used by the lab 6 scripts, in the formats the earlier labs use.
+"""
+
+# Romania road map: {City: {Neighbor: Distance, ...}, ...} (as in lab5/Task1.py)
+romania_map = {
+    'Arad': {'Sibiu': 140, 'Timisoara': 118, 'Zerind': 75},
+    'Zerind': {'Arad': 75, 'Oradea': 71},
+    'Oradea': {'Zerind': 71, 'Sibiu': 151},
+    'Timisoara': {'Arad': 118, 'Lugoj': 111},
+    'Lugoj': {'Timisoara': 111, 'Mehadia': 70},
+    'Mehadia': {'Lugoj': 70, 'Drobeta': 75},
+    'Drobeta': {'Mehadia': 75, 'Craiova': 120},
+    'Sibiu': {'Arad': 140, 'Oradea': 151, 'Fagaras': 99, 'Rimnicu Vilcea': 80},
+    'Rimnicu Vilcea': {'Sibiu': 80, 'Pitesti': 97, 'Craiova': 146},
+    'Craiova': {'Drobeta': 120, 'Rimnicu Vilcea': 146, 'Pitesti': 138},
+    'Fagaras': {'Sibiu': 99, 'Bucharest': 211},
+    'Pitesti': {'Rimnicu Vilcea': 97, 'Craiova': 138, 'Bucharest': 101},
+    'Bucharest': {'Fagaras': 211, 'Pitesti': 101, 'Giurgiu': 90, 'Urziceni': 85},
+    'Giurgiu': {'Bucharest': 90},
+    'Urziceni': {'Bucharest': 85, 'Vaslui': 142, 'Hirsova': 98},
+    'Hirsova': {'Urziceni': 98, 'Eforie': 86},
+    'Eforie': {'Hirsova': 86},
+    'Vaslui': {'Urziceni': 142, 'Iasi': 92},
+    'Iasi': {'Vaslui': 92, 'Neamt': 87},
+    'Neamt': {'Iasi': 87}
+}
+
+# The same map as {City: [(Neighbor, Distance), ...]} (as in LAB3/TASK1Cost.py)
+romania_edges = {city: list(neighbors.items()) for city, neighbors in romania_map.items()}
+
+# Unweighted graph: {Node: [Neighbor, ...]} (as in lab5/BFSDtoG.py)
+graph = {
+    'A': ['B', 'E', 'C'],
+    'B': ['D', 'E', 'A'],
+    'C': ['A', 'F', 'G'],
+    'D': ['B', 'E'],
+    'E': ['A', 'B', 'D'],
+    'F': ['C'],
+    'G': ['C'],
+}
+
+
+class Node:
+    """Search node as in lab5/activity.py."""
+
+    def __init__(self, state, parent, actions, totalCost):
+        self.state = state
+        self.parent = parent
+        self.actions = actions
+        self.totalCost = totalCost
+
+
+def node_graph():
+    """`graph` as {Node name: Node} (as in lab5/activity.py)."""
+    return {name: Node(name, None, list(neighbors), None) for name, neighbors in graph.items()}
+
+
+# Map positions of the Romania cities (the usual AIMA coordinates). The straight
+# line between two cities is never longer than the road, so the Euclidean
+# distance is an admissible A* heuristic on romania_map.
+romania_coordinates = {
+    'Arad': (91, 492), 'Bucharest': (400, 327), 'Craiova': (253, 288),
+    'Drobeta': (165, 299), 'Eforie': (562, 293), 'Fagaras': (305, 449),
+    'Giurgiu': (375, 270), 'Hirsova': (534, 350), 'Iasi': (473, 506),
+    'Lugoj': (165, 379), 'Mehadia': (168, 339), 'Neamt': (406, 537),
+    'Oradea': (131, 571), 'Pitesti': (320, 368), 'Rimnicu Vilcea': (233, 410),
+    'Sibiu': (207, 457), 'Timisoara': (94, 410), 'Urziceni': (456, 350),
+    'Vaslui': (509, 444), 'Zerind': (108, 531),
+}
@@ -0,0 +1,295 @@
+"""
+Route result cache over a graph that changes while it is being queried.
+
+MutableGraph keeps the lab's {Node: {Neighbor: weight}} adjacency, lets edges
+be added, removed and reweighted, and tells its listeners about every change.
+RouteCache remembers (start, target) results of Dijkstra and BFS in an LRU
+and, when an edge changes, drops only the entries the change can affect:
+
+    edge removed / made more expensive
+        only results whose path used the edge; every other path still
+        exists at the same cost and nothing got cheaper.
+    edge added / made cheaper (u -> v, weight w)
+        only results whose search reached u at a cost d with d + w below the
+        cached cost; any node reached later was already at least that far
+        away, so no new route through the edge can beat the cached one.
+
+For BFS the weight is one hop and reweighting an edge changes nothing.
+"""
+import random
+import threading
+from collections import OrderedDict, deque
+
+from csr_graph import CSRGraph
+from dijkstra import INF, build_path, shortest_paths
+from maps import romania_map
+
+
+class MutableGraph:
+    """
+    Directed weighted graph that can be edited edge by edge.
+
+    With `symmetric` every change is applied to both directions, as for the
+    two-way roads of romania_map. Searches run on a CSRGraph snapshot that is
+    rebuilt on first use after a change, so a burst of updates costs one
+    rebuild. Edits and snapshot builds hold one lock, so threads may query
+    and update the graph at the same time.
+    """
+
+    def __init__(self, adjacency=None, symmetric=False):
+        self.adjacency = {}
+        self.symmetric = symmetric
+        self.version = 0
+        self._listeners = []
+        self._snapshot = None
+        self._snapshot_version = -1
+        self._lock = threading.RLock()
+        for u, neighbors in (adjacency or {}).items():
+            self.adjacency.setdefault(u, {})
+            for v, w in neighbors.items():
+                self.adjacency.setdefault(v, {})
+                self.adjacency[u][v] = w
+
+    def subscribe(self, listener):
+        """Calls listener(u, v, old_weight, new_weight) after every edge change;
+        old_weight is None for a new edge, new_weight None for a removed one."""
+        self._listeners.append(listener)
+
+    def _set(self, u, v, weight):
+        # Caller holds the lock
+        old = self.adjacency.get(u, {}).get(v)
+        if old == weight:
+            return
+        self.adjacency.setdefault(u, {})
+        self.adjacency.setdefault(v, {})
+        if weight is None:
+            del self.adjacency[u][v]
+        else:
+            self.adjacency[u][v] = weight
+        self.version += 1
+        self._snapshot = None
+        for listener in self._listeners:
+            listener(u, v, old, weight)
+
+    def _change(self, u, v, weight):
+        with self._lock:
+            self._set(u, v, weight)
+            if self.symmetric:
+                self._set(v, u, weight)
+
+    def add_edge(self, u, v, weight=1):
+        if weight < 0:
+            raise ValueError('edge weights must be non-negative')
+        self._change(u, v, weight)
+
+    def set_weight(self, u, v, weight):
+        with self._lock:
+            if v not in self.adjacency.get(u, {}):
+                raise KeyError(f'no edge {u} -> {v}')
+            self.add_edge(u, v, weight)
+
+    def remove_edge(self, u, v):
+        with self._lock:
+            if v not in self.adjacency.get(u, {}):
+                raise KeyError(f'no edge {u} -> {v}')
+            self._change(u, v, None)
+
+    def snapshot(self):
+        """
+        The current graph as a CSRGraph.
+
+        Returns:
+            tuple: (CSRGraph, the version it was built from)
+        """
+        with self._lock:
+            if self._snapshot is None or self._snapshot_version != self.version:
+                self._snapshot = CSRGraph.from_dict_of_dicts(self.adjacency)
+                self._snapshot_version = self.version
+            return self._snapshot, self._snapshot_version
+
+
+def bfs_tree(g, source, target):
+    """
+    BFS over int ids that stops once `target` is dequeued.
+
+    Returns:
+        tuple: (depth dict of the nodes reached, parent dict)
+    """
+    depth = {source: 0}
+    parent = {source: -1}
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        if u == target:
+            break
+        for v, _ in g.neighbors(u):
+            if v not in depth:
+                depth[v] = depth[u] + 1
+                parent[v] = u
+                queue.append(v)
+    return depth, parent
+
+
+class RouteCache:
+    """
+    LRU of route results keyed by (search, start, target).
+
+    Each entry keeps the edges of its path and the nodes its search reached
+    below the final cost; two indexes map edges and nodes back to entries so
+    an edge change only looks at the entries it can touch.
+    """
+
+    def __init__(self, graph, max_entries=1024):
+        self.graph = graph
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (result, path edges, {node: cost reached}, cost)
+        self._by_edge = {}
+        self._by_node = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        graph.subscribe(self._edge_changed)
+
+    # --- Queries -----------------------------------------------------------
+
+    def dijkstra(self, start, target):
+        """
+        Cheapest path, as dijkstra.dijkstra.
+
+        Returns:
+            tuple: (path as list of names, total cost), or (None, inf).
+        """
+        return self._query('dijkstra', start, target)
+
+    def bfs(self, start, target):
+        """Fewest-edges path as a list of names, or None if unreachable."""
+        return self._query('bfs', start, target)
+
+    def _query(self, search, start, target):
+        key = (search, start, target)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key][0]
+            self.stats['misses'] += 1
+
+        g, version = self.graph.snapshot()
+        s, t = g.id(start), g.id(target)
+        if search == 'dijkstra':
+            dist, parent, _ = shortest_paths(g, s, [t])
+            cost = dist[t]
+            path = g.path_names(build_path(parent, t)) if cost != INF else None
+            result = (path, cost)
+            reached = {g.name(v): d for v, d in enumerate(dist) if d < cost}
+        else:
+            depth, parent = bfs_tree(g, s, t)
+            cost = depth.get(t, INF)
+            path = g.path_names(build_path(parent, t)) if cost != INF else None
+            result = path
+            reached = {g.name(v): d for v, d in depth.items() if d < cost}
+
+        with self._lock:
+            # A change that landed during the search may already have made
+            # the result stale; answer it but do not keep it
+            if self.graph.version == version:
+                edges = list(zip(path, path[1:])) if path else []
+                self._store(key, (result, edges, reached, cost))
+        return result
+
+    def _store(self, key, entry):
+        # Caller holds the lock
+        self._entries[key] = entry
+        _, edges, reached, _ = entry
+        for edge in edges:
+            self._by_edge.setdefault(edge, set()).add(key)
+        for node in reached:
+            self._by_node.setdefault(node, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def _drop(self, key):
+        # Caller holds the lock
+        _, edges, reached, _ = self._entries.pop(key)
+        for index, items in ((self._by_edge, edges), (self._by_node, reached)):
+            for item in items:
+                keys = index[item]
+                keys.discard(key)
+                if not keys:
+                    del index[item]
+
+    # --- Invalidation ------------------------------------------------------
+
+    def _edge_changed(self, u, v, old, new):
+        stale = set()
+        with self._lock:
+            if new is None:
+                # Removed: every search loses the edge
+                stale.update(self._by_edge.get((u, v), ()))
+            elif old is not None and new > old:
+                # More expensive: BFS does not care about weights
+                stale.update(k for k in self._by_edge.get((u, v), ()) if k[0] == 'dijkstra')
+            if old is None or (new is not None and new < old):
+                for key in self._by_node.get(u, ()):
+                    search = key[0]
+                    if search == 'bfs' and old is not None:
+                        continue  # a cheaper edge is still one hop
+                    _, _, reached, cost = self._entries[key]
+                    step = 1 if search == 'bfs' else new
+                    if reached[u] + step < cost:
+                        stale.add(key)
+            for key in stale:
+                self._drop(key)
+            self.stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_edge.clear()
+            self._by_node.clear()
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries)
+
+
+def main():
+    roads = MutableGraph(romania_map, symmetric=True)
+    cache = RouteCache(roads)
+    pairs = [(a, b) for a in romania_map for b in romania_map]
+    for _ in range(2):
+        for a, b in pairs:
+            cache.dijkstra(a, b)
+            cache.bfs(a, b)
+    print("After two passes over all pairs:", cache.info())
+
+    before = cache.info()['entries']
+    roads.remove_edge('Pitesti', 'Bucharest')
+    print(f"Closing Pitesti - Bucharest dropped {before - cache.info()['entries']} of {before} entries")
+    path, cost = cache.dijkstra('Arad', 'Bucharest')
+    print(f"Arad → Bucharest now: {' → '.join(path)}, cost {cost:g}")
+
+    # Random closures, reopenings and reweights; the cache must always agree
+    # with a fresh search
+    rng = random.Random(7)
+    edges = [(u, v, w) for u, vs in romania_map.items() for v, w in vs.items() if u < v]
+    for _ in range(200):
+        u, v, w = rng.choice(edges)
+        if v in roads.adjacency[u] and rng.random() < 0.4:
+            roads.remove_edge(u, v)
+        else:
+            roads.add_edge(u, v, w + rng.randint(-40, 40))
+        for a, b in rng.sample(pairs, 40):
+            g, _ = roads.snapshot()
+            dist = shortest_paths(g, g.id(a))[0]
+            assert cache.dijkstra(a, b)[1] == dist[g.id(b)], (a, b)
+            depth, _ = bfs_tree(g, g.id(a), g.id(b))
+            path = cache.bfs(a, b)
+            assert (len(path) - 1 if path else INF) == depth.get(g.id(b), INF), (a, b)
+    info = cache.info()
+    print(f"200 random updates: {info['hits']} hits, {info['misses']} misses, "
+          f"{info['invalidations']} entries invalidated")
+
+
+if __name__ == "__main__":
+    main()
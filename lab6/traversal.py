@@ -0,0 +1,214 @@
+"""
+Re-entrant graph traversal for concurrent searches over one shared graph.
+
+`DFS` in lab5/activity.py keeps its search state in the graph itself (it
+writes graph[child].parent) and tests `child not in frontier` and
+`child not in explored` against lists, which is O(n) per test. Two searches
+at once overwrite each other's parents, and a single one is quadratic.
+
+Here all per-query state lives in a Search object: a parent dict (O(1)
+"seen" test and the path) and the frontier. The graph is a CSRGraph and is
+only ever read, so any number of threads can search it at the same time.
+The exploration order comes out of a generator, one node at a time, with
+optional Visitor hooks instead of an `explored` list.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from csr_graph import CSRGraph
+from generators import grid
+from maps import Node, graph, node_graph
+
+
+class Visitor:
+    """
+    Hooks called while a Search runs; override the ones you need.
+
+    discover(node, parent)  first time `node` is reached; return False to
+                            leave it unexplored (e.g. a depth limit)
+    expand(node)            `node` is about to have its neighbours scanned
+    finish(node)            all of `node`'s neighbours are done (the point
+                            where lab5's DFS backtracks)
+    """
+
+    def discover(self, node, parent):
+        return True
+
+    def expand(self, node):
+        pass
+
+    def finish(self, node):
+        pass
+
+
+class Search:
+    """
+    One traversal of `g` from `start`; iterate over it to get node ids in the
+    order they are expanded.
+
+    Args:
+        g (CSRGraph): The shared graph (never modified).
+        start (int): Start node id.
+        order (str): 'dfs' (recursive depth-first order) or 'bfs'.
+        visitor (Visitor): Optional hooks.
+    """
+
+    def __init__(self, g, start, order='dfs', visitor=None):
+        if order not in ('dfs', 'bfs'):
+            raise ValueError(f"order must be 'dfs' or 'bfs', not {order!r}")
+        self.g = g
+        self.start = start
+        self.order = order
+        self.visitor = visitor or Visitor()
+        self.parent = {}
+
+    def _children(self, u):
+        return iter(self.g.targets[self.g.offsets[u]:self.g.offsets[u + 1]])
+
+    def __iter__(self):
+        visitor, parent = self.visitor, self.parent
+        parent[self.start] = -1
+        if visitor.discover(self.start, -1) is False:
+            return
+        if self.order == 'bfs':
+            queue = deque([self.start])
+            while queue:
+                u = queue.popleft()
+                visitor.expand(u)
+                yield u
+                for v in self._children(u):
+                    if v not in parent:
+                        parent[v] = u
+                        if visitor.discover(v, u) is not False:
+                            queue.append(v)
+                visitor.finish(u)
+            return
+
+        # A stack of neighbour iterators gives the same order as recursion
+        # without Python's recursion limit
+        visitor.expand(self.start)
+        yield self.start
+        stack = [(self.start, self._children(self.start))]
+        while stack:
+            u, children = stack[-1]
+            for v in children:
+                if v not in parent:
+                    parent[v] = u
+                    if visitor.discover(v, u) is False:
+                        continue
+                    visitor.expand(v)
+                    yield v
+                    stack.append((v, self._children(v)))
+                    break
+            else:
+                stack.pop()
+                visitor.finish(u)
+
+    def path_to(self, node):
+        """Start-to-node path (ids) through the parents found so far, None if not reached."""
+        if node not in self.parent:
+            return None
+        path = []
+        while node != -1:
+            path.append(node)
+            node = self.parent[node]
+        return path[::-1]
+
+
+def find_path(g, start, goal, order='dfs', visitor=None):
+    """
+    Path between two named nodes, stopping as soon as `goal` is expanded.
+
+    Returns:
+        tuple: (path as list of names or None, nodes expanded)
+    """
+    goal_id = g.id(goal)
+    search = Search(g, g.id(start), order, visitor)
+    expanded = 0
+    for node in search:
+        expanded += 1
+        if node == goal_id:
+            return g.path_names(search.path_to(node)), expanded
+    return None, expanded
+
+
+def traverse(g, start, order='dfs', visitor=None):
+    """Exploration order from a named node, as names."""
+    for node in Search(g, g.id(start), order, visitor):
+        yield g.name(node)
+
+
+class DepthLimit(Visitor):
+    """Example visitor: does not go further than `limit` edges from the start."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.depth = {}
+
+    def discover(self, node, parent):
+        self.depth[node] = 0 if parent == -1 else self.depth[parent] + 1
+        return self.depth[node] <= self.limit
+
+
+def lab5_dfs(nodes, start, goal):
+    """lab5/activity.py DFS, with the graph passed in, for the timing comparison."""
+    frontier = [start]
+    explored = []
+    while frontier:
+        current = frontier.pop()
+        explored.append(current)
+        children = 0
+        for child in nodes[current].actions:
+            if child not in frontier and child not in explored:
+                nodes[child].parent = current
+                if child == goal:
+                    return True
+                children += 1
+                frontier.append(child)
+        if children == 0:
+            explored.pop()
+    return False
+
+
+def main():
+    small = CSRGraph.from_any(graph)
+    print("DFS from D:", ' '.join(traverse(small, 'D')))
+    print("BFS from D:", ' '.join(traverse(small, 'D', 'bfs')))
+    path, expanded = find_path(small, 'D', 'C')
+    print(f"D → C: {' -> '.join(path)} ({expanded} nodes expanded)")
+    print("Within 1 edge of A:", ' '.join(traverse(small, 'A', 'bfs', DepthLimit(1))))
+
+    # The Node objects are only read: no parent is written anywhere
+    nodes = node_graph()
+    find_path(CSRGraph.from_any(nodes), 'D', 'C')
+    assert all(node.parent is None for node in nodes.values())
+
+    # Many threads over one shared graph must agree with a single-threaded run
+    g = grid(20_000, seed=3)
+    goals = list(range(0, len(g), 97))
+    expected = {goal: find_path(g, 0, goal, 'bfs') for goal in goals}
+    threads = 8
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda goal: find_path(g, 0, goal, 'bfs'), goals))
+    assert results == [expected[goal] for goal in goals]
+    print(f"{len(goals)} BFS queries on {threads} threads matched the sequential run")
+
+    # Exploring a whole grid (no goal): lab5's list lookups make it quadratic
+    print(f"\n{'grid nodes':>10}{'lab5 DFS ms':>14}{'Search ms':>12}")
+    for n in (1_000, 2_000, 4_000):
+        g = grid(n, seed=3)
+        nodes = {u: Node(u, None, list(g.targets[g.offsets[u]:g.offsets[u + 1]]), None)
+                 for u in range(n)}
+        began = time.perf_counter()
+        lab5_dfs(nodes, 0, None)
+        lab5_ms = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        for _ in Search(g, 0):
+            pass
+        search_ms = (time.perf_counter() - began) * 1000
+        print(f"{n:>10}{lab5_ms:>14.1f}{search_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds, Prometheus style (the +Inf bucket is implicit)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PIXELS_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+# The stages of one conversion, in pipeline order
+STAGES = ('upload_read', 'decode', 'preprocess', 'ocr', 'parse', 'export')
+
+
+@contextmanager
+def timed(timings, stage):
+    """Adds the wall time of the `with` block to timings[stage] (in seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def timed_iter(iterable, timings, stage):
+    """
+    Yields from `iterable`, adding the time spent producing each item to
+    timings[stage]; for response bodies that are generated while they are sent.
+    """
+    iterator = iter(iterable)
+    while True:
+        with timed(timings, stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label value."""
+
+    def __init__(self, name, help_text, buckets, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+
+    def observe(self, value, label_value=None):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_value, series in sorted(self._series.items(), key=lambda item: str(item[0])):
+            prefix = f'{self.label}="{label_value}",' if self.label else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            suffix = f'{{{prefix.rstrip(",")}}}' if prefix else ''
+            lines.append(f'{self.name}_sum{suffix} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{suffix} {series[-1]}')
+        return lines
+
+
+class Metrics:
+    """
+    In-process metrics for the OCR service, rendered in the Prometheus text
+    format. Each web process keeps its own numbers (scrape every process, or
+    run one), the OCR workers report theirs back with every result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram('ocr_stage_seconds', 'Time spent in each conversion stage.',
+                                       SECONDS_BUCKETS, label='stage')
+        self.request_seconds = Histogram('ocr_request_seconds', 'End-to-end request latency per endpoint.',
+                                         SECONDS_BUCKETS, label='endpoint')
+        self.image_width = Histogram('ocr_image_width_pixels', 'Width of OCR\'d images.', PIXELS_BUCKETS)
+        self.image_height = Histogram('ocr_image_height_pixels', 'Height of OCR\'d images.', PIXELS_BUCKETS)
+        self.table_rows = Histogram('ocr_table_rows', 'Rows in extracted tables.', COUNT_BUCKETS)
+        self.table_columns = Histogram('ocr_table_columns', 'Columns in extracted tables.', COUNT_BUCKETS)
+        self._histograms = (self.stage_seconds, self.request_seconds, self.image_width,
+                            self.image_height, self.table_rows, self.table_columns)
+
+    def observe_stages(self, timings):
+        with self._lock:
+            for stage, seconds in timings.items():
+                self.stage_seconds.observe(seconds, stage)
+
+    def observe_ocr(self, stats):
+        """Records the stats dict a worker returns with a fresh OCR result."""
+        with self._lock:
+            for stage, seconds in stats.get('timings', {}).items():
+                self.stage_seconds.observe(seconds, stage)
+            if stats.get('width'):
+                self.image_width.observe(stats['width'])
+                self.image_height.observe(stats['height'])
+            self.table_rows.observe(stats.get('rows', 0))
+            self.table_columns.observe(stats.get('columns', 0))
+
+    def observe_request(self, endpoint, seconds):
+        with self._lock:
+            self.request_seconds.observe(seconds, endpoint)
+
+    def render(self, counters=None):
+        """
+        Returns the Prometheus exposition text.
+
+        Args:
+            counters (dict): Extra name -> value pairs to expose as plain samples
+                (e.g. the OCR cache counters).
+        """
+        with self._lock:
+            lines = []
+            for histogram in self._histograms:
+                lines.extend(histogram.render())
+        for name, value in (counters or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_key(data, config, frame=0):
+    """
+    Content address of one OCR run: hash of the image bytes plus everything
+    that changes the OCR output (Tesseract config string and TIFF frame).
+    """
+    h = hashlib.sha256(data)
+    h.update(f'\0{config}\0{frame}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+class OCRCache:
+    """
+    Two-tier cache of OCR results ({'text': ..., 'rows': ...}).
+
+    A size-bounded in-memory LRU sits in front of a JSON file store on disk,
+    so results survive restarts and are shared by every worker process that
+    points at the same folder. Disk entries are pruned oldest-first once the
+    folder grows past `max_disk_bytes`.
+    """
+
+    def __init__(self, folder, max_entries=512, max_disk_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+        os.makedirs(folder, exist_ok=True)
+        self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key + '.json')
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_mtime, st.st_size
+
+    def _remember(self, key, value):
+        # Caller holds the lock
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['memory_evictions'] += 1
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # keep recently used files away from the pruner
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Stores an OCR result in both tiers."""
+        with self._lock:
+            self._remember(key, value)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        size = os.path.getsize(tmp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._disk_bytes += size - old_size
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Drop the least recently used files until we are back under 90% of the limit
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_disk_bytes * 0.9
+        evicted = 0
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self.stats['disk_evictions'] += evicted
+
+    def info(self):
+        """Counters and sizes for the /cache/stats endpoint."""
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = lookups - self.stats['misses']
+            return dict(
+                self.stats,
+                memory_entries=len(self._memory),
+                max_entries=self.max_entries,
+                disk_bytes=self._disk_bytes,
+                max_disk_bytes=self.max_disk_bytes,
+                hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            )
@@ -0,0 +1,169 @@
+import os
+import re
+import shutil
+import threading
+
+# The Tesseract bindings are imported on first use, not at import time:
+# pytesseract pulls in pandas when it is installed, which alone costs about
+# half a second, and the web process never OCRs anything itself.
+#
+# tesserocr binds the Tesseract C++ API directly, so the engine and its
+# traineddata are loaded once per process instead of once per call.
+# It is optional: without it every call falls back to the pytesseract CLI wrapper.
+_modules = {}
+_modules_lock = threading.Lock()
+_local = threading.local()
+
+# Where the installer puts tesseract.exe on Windows, where it is rarely on PATH
+WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+def find_tesseract():
+    """
+    Locates the tesseract binary for pytesseract: the TESSERACT_CMD
+    environment variable if set, else the first `tesseract` on PATH, else the
+    default Windows install location.
+
+    Returns:
+        str: Path (or bare command name) of the binary.
+    """
+    configured = os.environ.get('TESSERACT_CMD')
+    if configured:
+        return configured
+    found = shutil.which('tesseract')
+    if found:
+        return found
+    if os.name == 'nt' and os.path.exists(WINDOWS_TESSERACT):
+        return WINDOWS_TESSERACT
+    return 'tesseract'
+
+
+def _tesserocr():
+    """The tesserocr module, or None if it is not installed."""
+    if 'tesserocr' not in _modules:
+        with _modules_lock:
+            if 'tesserocr' not in _modules:
+                try:
+                    import tesserocr
+                except ImportError:
+                    tesserocr = None
+                _modules['tesserocr'] = tesserocr
+    return _modules['tesserocr']
+
+
+def _pytesseract():
+    """The pytesseract module, pointed at the binary from find_tesseract()."""
+    if 'pytesseract' not in _modules:
+        with _modules_lock:
+            if 'pytesseract' not in _modules:
+                import pytesseract
+                pytesseract.pytesseract.tesseract_cmd = find_tesseract()
+                _modules['pytesseract'] = pytesseract
+    return _modules['pytesseract']
+
+
+def _parse_config(config):
+    """Pulls psm, oem and lang out of a pytesseract-style config string."""
+    psm = re.search(r'--psm\s+(\d+)', config)
+    oem = re.search(r'--oem\s+(\d+)', config)
+    lang = re.search(r'(?:^|\s)-l\s+(\S+)', config)
+    return (int(psm.group(1)) if psm else 3,
+            int(oem.group(1)) if oem else 3,
+            lang.group(1) if lang else 'eng')
+
+
+def with_psm(config, psm):
+    """Returns `config` with its page segmentation mode replaced by `psm`."""
+    if re.search(r'--psm\s+\d+', config):
+        return re.sub(r'--psm\s+\d+', f'--psm {psm}', config)
+    return f'{config} --psm {psm}'.strip()
+
+
+def engine_name():
+    return 'tesserocr' if _tesserocr() is not None else 'pytesseract'
+
+
+def get_api(config):
+    """
+    Returns this thread's loaded tesserocr API for `config`, creating it on
+    first use. PyTessBaseAPI is not thread-safe, so each thread gets its own.
+    One API (and one copy of the traineddata) serves every page segmentation
+    mode of a language; the mode is switched per call.
+    """
+    apis = getattr(_local, 'apis', None)
+    if apis is None:
+        apis = _local.apis = {}
+    psm, oem, lang = _parse_config(config)
+    api = apis.get((lang, oem))
+    if api is None:
+        kwargs = {'lang': lang, 'psm': psm, 'oem': oem}
+        if os.environ.get('TESSDATA_PREFIX'):
+            kwargs['path'] = os.environ['TESSDATA_PREFIX']
+        api = apis[(lang, oem)] = _tesserocr().PyTessBaseAPI(**kwargs)
+    else:
+        api.SetPageSegMode(psm)
+    return api
+
+
+def preload():
+    """Imports the OCR engine now instead of on the first OCR call."""
+    if _tesserocr() is None:
+        _pytesseract()
+
+
+def warm_up(config):
+    """
+    Loads the engine for `config` ahead of the first real job. Used as the
+    initializer of the OCR worker processes.
+    """
+    preload()
+    if _tesserocr() is not None:
+        get_api(config)
+
+
+def image_to_text(img, config):
+    """Recognises the whole image and returns its text."""
+    if _tesserocr() is None:
+        return _pytesseract().image_to_string(img, config=config)
+    api = get_api(config)
+    api.SetImage(img)
+    return api.GetUTF8Text()
+
+
+def image_to_words(img, config):
+    """
+    Recognises the image and returns every word with its bounding box.
+
+    Returns:
+        list: (left, top, width, height, text) tuples, one per word.
+    """
+    words = []
+    tesserocr = _tesserocr()
+    if tesserocr is None:
+        pytesseract = _pytesseract()
+        data = pytesseract.image_to_data(img, config=config, output_type=pytesseract.Output.DICT)
+        for left, top, width, height, conf, text in zip(data['left'], data['top'], data['width'],
+                                                        data['height'], data['conf'], data['text']):
+            text = (text or '').strip()
+            # conf is -1 for the block/paragraph/line entries, which carry no text
+            if text and float(conf) >= 0:
+                words.append((int(left), int(top), int(width), int(height), text))
+        return words
+
+    api = get_api(config)
+    api.SetImage(img)
+    api.Recognize()
+    level = tesserocr.RIL.WORD
+    iterator = api.GetIterator()
+    if iterator is None:
+        return words
+    for item in tesserocr.iterate_level(iterator, level):
+        try:
+            text = (item.GetUTF8Text(level) or '').strip()
+        except RuntimeError:
+            continue  # raised for empty results, e.g. on a blank page
+        box = item.BoundingBox(level)
+        if text and box:
+            x1, y1, x2, y2 = box
+            words.append((x1, y1, x2 - x1, y2 - y1, text))
+    return words
@@ -0,0 +1,443 @@
+import importlib.util
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from ocr_cache import cache_key
+from ocr_engine import engine_name, warm_up
+from metrics import timed
+from ocr_pipeline import (OCR_CONFIG, TABLE_MODE, merge_bands, needs_tiling, ocr_band, ocr_signature,
+                          run_ocr, split_bands, table_stats)
+from table_extract import extract_grid
+
+log = logging.getLogger(__name__)
+
+
+# Imported once by the forkserver process. Every OCR worker is forked from it,
+# so it starts with these already loaded and shares their pages copy-on-write.
+WORKER_PRELOAD = ['numpy', 'PIL.Image', 'ocr_pipeline']
+
+
+def worker_context():
+    """
+    The multiprocessing context for the OCR pool: forkserver where the
+    platform has it (max_tasks_per_child rules out plain fork), else spawn.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    engine = 'tesserocr' if importlib.util.find_spec('tesserocr') else 'pytesseract'
+    ctx = multiprocessing.get_context('forkserver')
+    ctx.set_forkserver_preload(WORKER_PRELOAD + [engine])
+    return ctx
+
+
+def _ping():
+    # Health check task: proves a worker can still pick up and finish work
+    return os.getpid()
+
+
+def _dead_workers(executor):
+    """Worker processes of `executor` that have exited without being replaced."""
+    processes = getattr(executor, '_processes', None) or {}
+    return [p for p in list(processes.values()) if p.exitcode is not None]
+
+
+class QueueFull(Exception):
+    """
+    Raised when the OCR pool already has its maximum number of conversions in
+    flight. `retry_after` is a guess, in whole seconds, of when to try again.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Submit/poll/fetch job queue backed by a bounded process pool.
+
+    The OCR stage runs in worker processes, so the Flask request threads only
+    read the upload, hand the bytes over and return a job id straight away.
+    Finished results are kept for `result_ttl` seconds and then dropped.
+    With an OCRCache attached, images seen before complete without touching
+    the pool and every fresh result is written back to the cache.
+
+    The workers are long-lived and warm: each loads the OCR engine once when
+    it starts (see ocr_engine.warm_up) and is replaced after `recycle_after`
+    jobs to cap slow leaks in the native library. On POSIX they are forked
+    from a forkserver that has already imported the OCR stack, so a new or
+    recycled worker skips those imports. check_health() pings the pool and
+    rebuilds it if it broke or a worker died; a ping stuck behind queued work
+    only reports the pool as busy.
+
+    Tall images are split into bands that are OCR'd on several workers at
+    once; a small thread pool waits on the band results and stitches them.
+    stream() always goes the band route, with bands of about BAND_MIN_HEIGHT
+    px, and reports each band's rows as soon as its OCR is done.
+
+    Fresh results carry a 'stats' entry (stage timings, image and table size)
+    that is passed to `metrics.observe_ocr` and left out of the cache.
+
+    Identical uploads that arrive while the first copy is still being OCR'd
+    are coalesced: they get the future of the run already in flight (keyed
+    like the cache) instead of starting their own. At most `max_pending`
+    distinct runs are in flight; beyond that new work is refused with
+    QueueFull, which the web layer turns into a 429, so an overloaded pool
+    sheds load instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, result_ttl=3600, cache=None,
+                 recycle_after=500, metrics=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Allow a few runs per worker to wait in line, refuse anything beyond that
+        self.max_pending = max_pending or self.max_workers * 4
+        self.result_ttl = result_ttl
+        self.cache = cache
+        self.metrics = metrics
+        self.recycle_after = recycle_after
+        self.restarts = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._avg_seconds = 1.0  # moving average of a run's worker time, for Retry-After
+        self._inflight = {}  # run key -> Future
+        self._executor = None
+        # Guards creating and replacing the pool; separate from _lock because
+        # _run submits while holding _lock
+        self._pool_lock = threading.Lock()
+        self._coordinator = ThreadPoolExecutor(max_workers=self.max_pending,
+                                               thread_name_prefix='ocr-bands')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so importing the app never forks worker processes
+        with self._pool_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=warm_up,
+                    initargs=(OCR_CONFIG,),
+                    max_tasks_per_child=self.recycle_after,
+                    mp_context=worker_context(),
+                )
+            return self._executor
+
+    def _restart(self, broken):
+        """
+        Throws away a broken pool; the next submit starts a fresh, warm one.
+        Does nothing if another thread has already replaced `broken`, so a
+        pool that was just rebuilt is never shut down by a late caller.
+        """
+        with self._pool_lock:
+            if broken is None or self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_to_pool(self, fn, *args):
+        """Submits to the current pool; returns (pool, future)."""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker crashed (e.g. killed by the OOM killer): rebuild once and retry
+            self._restart(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(fn, *args)
+
+    def _submit(self, fn, *args):
+        return self._submit_to_pool(fn, *args)[1]
+
+    def check_health(self, timeout=10):
+        """
+        Sends a no-op task through the pool and waits for it.
+
+        The ping queues behind the OCR work already submitted, so a ping that
+        times out while every worker is alive means the pool is busy, not
+        broken. The pool is only rebuilt when it reports itself broken or one
+        of its worker processes has died.
+
+        Returns:
+            dict: {'ok': bool, 'status': 'ok' | 'busy' | 'failed', 'engine': ...,
+            'workers': ..., 'restarts': ..., plus the load counters from load_info()}
+        """
+        info = {'engine': engine_name(), 'workers': self.max_workers}
+        executor = None
+        try:
+            executor, future = self._submit_to_pool(_ping)
+            future.result(timeout=timeout)
+            info['ok'], info['status'] = True, 'ok'
+        except TimeoutError:
+            future.cancel()
+            if _dead_workers(executor):
+                info['ok'], info['status'] = False, 'failed'
+                info['error'] = 'worker process died'
+                self._restart(executor)
+            else:
+                info['ok'], info['status'] = True, 'busy'
+        except BrokenProcessPool as e:
+            info['ok'], info['status'] = False, 'failed'
+            info['error'] = str(e) or type(e).__name__
+            self._restart(executor)
+        except Exception as e:
+            info['ok'], info['status'] = False, 'failed'
+            info['error'] = str(e) or type(e).__name__
+        info['restarts'] = self.restarts
+        info.update(self.load_info())
+        return info
+
+    def load_info(self):
+        """Runs in flight, the admission limit, and coalesced / rejected totals."""
+        with self._lock:
+            return {'in_flight': len(self._inflight), 'max_in_flight': self.max_pending,
+                    'coalesced': self.coalesced, 'rejected': self.rejected}
+
+    def _check_capacity(self):
+        # Caller holds self._lock
+        if len(self._inflight) >= self.max_pending:
+            self.rejected += 1
+            retry_after = math.ceil(len(self._inflight) / self.max_workers * self._avg_seconds)
+            raise QueueFull(f'{len(self._inflight)} conversions already in progress', max(1, retry_after))
+
+    def _run(self, data, frame=0, admit=True, progress=None):
+        """
+        Returns a Future of run_ocr(), answered from the cache or joined onto
+        an identical run in flight when possible.
+
+        Args:
+            progress (callable): If given, a fresh run is OCR'd band by band and
+                this is called with a progress event per band (see stream()).
+
+        Raises:
+            QueueFull: If `admit` is set and the pool is saturated.
+        """
+        key = cache_key(data, ocr_signature(), frame)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if admit:
+                self._check_capacity()
+            if progress is not None and TABLE_MODE == 'boxes':
+                future = self._coordinator.submit(self._run_tiled, data, frame, progress)
+            elif needs_tiling(data, frame):
+                future = self._coordinator.submit(self._run_tiled, data, frame)
+            else:
+                future = self._submit(run_ocr, data, OCR_CONFIG, frame)
+            self._inflight[key] = future
+        future.add_done_callback(lambda f: self._store(key, f))
+        return future
+
+    def _run_tiled(self, data, frame, progress=None):
+        # One worker decodes and cuts the page, then every band goes to its own worker
+        band_count = self.max_workers if progress is None else None
+        bands, stats = self._submit(split_bands, data, frame, band_count).result()
+        timings = stats['timings']
+        with timed(timings, 'ocr'):
+            band_futures = [self._submit(ocr_band, band, OCR_CONFIG) for band in bands]
+            if progress is not None:
+                progress({'event': 'progress', 'stage': 'ocr', 'bands': len(bands), 'done': 0})
+                index = {future: i for i, future in enumerate(band_futures)}
+                for done, future in enumerate(as_completed(band_futures), 1):
+                    # A preview: columns are re-derived over the whole page at the end
+                    progress({'event': 'rows', 'band': index[future], 'bands': len(bands),
+                              'done': done, 'rows': extract_grid(future.result())[1]})
+            band_words = [f.result() for f in band_futures]
+        result = merge_bands(band_words, timings)
+        result['stats'] = table_stats(result['rows'], timings, (stats['width'], stats['height']))
+        return result
+
+    def run(self, data):
+        """
+        Converts one image on a warm worker and waits for the result.
+
+        Returns:
+            dict: {'text': ..., 'rows': ...} as produced by run_ocr().
+        """
+        return self._run(data).result()
+
+    def _store(self, key, future):
+        # A done-callback: concurrent.futures only logs what it raises, so
+        # nothing here may skip leaving the in-flight table
+        seconds = None
+        try:
+            if future.exception() is None:
+                result = future.result()
+                if 'stats' in result:
+                    seconds = sum(result['stats']['timings'].values())
+                    if self.metrics is not None:
+                        try:
+                            self.metrics.observe_ocr(result['stats'])
+                        except Exception:
+                            log.exception('Could not record OCR metrics')
+                if self.cache is not None:
+                    try:
+                        self.cache.put(key, {'text': result['text'], 'rows': result['rows']})
+                    except Exception:
+                        # e.g. disk full: the result is still good, it just is not cached
+                        log.exception('Could not cache OCR result %s', key)
+        finally:
+            # Only now leave the in-flight table, so a later identical upload
+            # finds either this run or its cached result
+            with self._lock:
+                if seconds is not None:
+                    self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and now - job['finished'] > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, data, filename='', progress=None):
+        """
+        Queues one image for conversion.
+
+        Args:
+            data (bytes): The uploaded image file content.
+            filename (str): Original upload name, kept for the status response.
+            progress (callable): Called with per-band events, see stream().
+
+        Returns:
+            str: The new job id.
+
+        Raises:
+            QueueFull: If the pool is saturated.
+        """
+        with self._lock:
+            self._purge_expired()
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id,
+                'filename': filename,
+                'submitted': time.time(),
+                'finished': None,
+                'future': None,
+            }
+            self._jobs[job_id] = job
+
+        try:
+            future = self._run(data, progress=progress)
+        except Exception:
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        job['future'] = future
+        future.add_done_callback(lambda f: self._on_done(job))
+        return job_id
+
+    def stream(self, data, filename=''):
+        """
+        Queues one image like submit() and follows its progress.
+
+        Returns:
+            tuple: (job_id, events). events is a generator of dicts:
+            {'event': 'progress', 'stage': 'ocr', 'bands': n, 'done': 0} once
+            the page is cut, {'event': 'rows', 'band': i, 'bands': n, 'done': k,
+            'rows': [...]} as each band finishes (in completion order), then
+            {'event': 'done', 'job_id': ..., 'rows': row count, 'columns': column
+            count} or {'event': 'error', 'job_id': ..., 'error': message}.
+            Results from the cache or from an identical run already in flight
+            arrive as a single 'rows' event with the whole table.
+
+        Raises:
+            QueueFull: If the pool is saturated.
+        """
+        events = queue.Queue()
+        job_id = self.submit(data, filename, progress=events.put)
+        future = self._jobs[job_id]['future']
+        future.add_done_callback(lambda f: events.put(None))
+
+        def follow():
+            streamed = False
+            yield {'event': 'progress', 'stage': 'queued', 'job_id': job_id}
+            for event in iter(events.get, None):
+                streamed = streamed or event['event'] == 'rows'
+                yield event
+            if future.exception() is not None:
+                yield {'event': 'error', 'job_id': job_id, 'error': str(future.exception())}
+                return
+            rows = future.result()['rows']
+            if not streamed:
+                yield {'event': 'rows', 'band': 0, 'bands': 1, 'done': 1, 'rows': rows}
+            yield {'event': 'done', 'job_id': job_id, 'rows': len(rows),
+                   'columns': len(rows[0]) if rows else 0}
+
+        return job_id, follow()
+
+    def _on_done(self, job):
+        job['finished'] = time.time()
+
+    def status(self, job_id):
+        """
+        Returns a JSON-friendly status dict for a job, or None if it is unknown.
+        The status is one of 'queued', 'running', 'done' or 'failed'.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job['future']
+        info = {'job_id': job_id, 'filename': job['filename']}
+        if future is None or not future.done():
+            info['status'] = 'running' if future is not None and future.running() else 'queued'
+        elif future.exception() is not None:
+            info['status'] = 'failed'
+            info['error'] = str(future.exception())
+        else:
+            info['status'] = 'done'
+            info['seconds'] = round((job['finished'] or time.time()) - job['submitted'], 3)
+        return info
+
+    def result(self, job_id):
+        """
+        Returns the table rows of a finished job.
+        Raises KeyError for unknown jobs; re-raises the worker error for failed ones.
+        """
+        job = self._jobs[job_id]
+        return job['future'].result(timeout=0)['rows']
+
+    def extract_pages(self, pages):
+        """
+        OCRs the pages of one batch upload concurrently on the worker pool.
+
+        Args:
+            pages (list): (label, bytes, frame) tuples from split_pages().
+
+        Returns:
+            list: (label, rows) pairs, in the same order as `pages`.
+
+        Raises:
+            QueueFull: If the pool is saturated. A batch is admitted or refused
+            as a whole, so a large batch never fails halfway through.
+        """
+        with self._lock:
+            self._check_capacity()
+        futures = [self._run(data, frame, admit=False) for _, data, frame in pages]
+        return [(label, future.result()['rows']) for (label, _, _), future in zip(pages, futures)]
+
+    def shutdown(self):
+        with self._pool_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
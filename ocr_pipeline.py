@@ -0,0 +1,366 @@
+import io
+import os
+import zipfile
+import numpy as np
+from PIL import Image
+from ingest import UploadRejected, check_archive, check_image
+from metrics import timed
+from ocr_engine import image_to_text, with_psm
+from preprocess import DEFAULT_OPTIONS, downscale_factor, options_signature, preprocess_image
+from regions import find_text_regions
+from table_extract import extract_grid, ocr_words
+
+# Use 'psm 6' (Assume a single uniform block of text)
+OCR_CONFIG = '--psm 6'
+
+# Image cleanup before OCR (see preprocess.DEFAULT_OPTIONS). Set OCR_PREPROCESS=0 to OCR raw uploads.
+PREPROCESS_ENABLED = os.environ.get('OCR_PREPROCESS', '1') != '0'
+PREPROCESS_OPTIONS = {}
+
+# How OCR output becomes a table: 'boxes' clusters Tesseract's word boxes into
+# rows/columns (table_extract.py), 'lines' is the old split-on-double-spaces parser.
+TABLE_MODE = os.environ.get('OCR_TABLE_MODE', 'boxes')
+
+# In 'boxes' mode only the text regions of a page are OCR'd (regions.py), each
+# with a page segmentation mode that suits it. Set OCR_ROI=0 to OCR whole pages.
+ROI_ENABLED = os.environ.get('OCR_ROI', '1') != '0'
+
+# Tall images (long statements, receipts) are cut into horizontal bands that are
+# OCR'd in parallel, about one band per worker but no shorter than roughly
+# BAND_MIN_HEIGHT px (after preprocessing). A cut forced through text overlaps
+# the next band by BAND_OVERLAP px.
+BAND_MIN_HEIGHT = int(os.environ.get('OCR_BAND_MIN_HEIGHT', 800))
+BAND_OVERLAP = 80
+
+# File types accepted inside a batch ZIP
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+
+def decode_image(data, frame=0, draft=False):
+    """
+    Opens raw upload bytes as a PIL image.
+
+    Args:
+        data (bytes): The uploaded PNG/JPG/TIFF file content.
+        frame (int): Page to select in a multi-page TIFF.
+        draft (bool): For JPEGs, let the decoder produce grayscale at reduced
+            resolution (1/2, 1/4 or 1/8) close to what preprocessing would
+            shrink the image to anyway. Much less decode work and memory.
+
+    Returns:
+        PIL.Image.Image: The decoded image (pixels are loaded lazily).
+    """
+    # BytesIO shares the bytes object's buffer, no copy is made here
+    img = Image.open(io.BytesIO(data))
+    if frame:
+        img.seek(frame)
+    if draft and img.format == 'JPEG' and PREPROCESS_ENABLED:
+        opts = dict(DEFAULT_OPTIONS, **PREPROCESS_OPTIONS)
+        scale = downscale_factor(img, opts['target_dpi'], opts['max_pixels'])
+        if scale < 1.0:
+            width = img.width
+            img.draft('L', (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+            # draft() leaves the DPI as it was; fix it so downscale() does not shrink twice
+            dpi = img.info.get('dpi')
+            if dpi and img.width != width:
+                ratio = img.width / width
+                img.info['dpi'] = (dpi[0] * ratio, dpi[1] * ratio)
+    return img
+
+
+def split_pages(data, filename):
+    """
+    Splits a batch upload into the individual pages to OCR.
+
+    A ZIP is expanded into its image entries (sorted by name) once their
+    declared sizes pass check_archive(); each entry is checked as an image
+    as soon as it is read. Every multi-page TIFF, uploaded directly or inside the ZIP, yields one page per
+    frame. Pages are not re-encoded: each one is the original file bytes plus
+    the frame index, so the workers decode only the frame they need.
+
+    Args:
+        data (bytes): The uploaded ZIP or image file content.
+        filename (str): Upload name, used for the page labels.
+
+    Returns:
+        list: (label, bytes, frame) tuples in page order.
+
+    Raises:
+        UploadRejected: If the archive or one of its entries is refused.
+    """
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        files = []
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            entries = sorted((info for info in archive.infolist()
+                              if info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                              and not info.filename.startswith('__MACOSX/')),
+                             key=lambda info: info.filename)
+            check_archive(entries)
+            for info in entries:
+                content = archive.read(info)
+                try:
+                    check_image(content)
+                except UploadRejected as e:
+                    raise UploadRejected(f'{info.filename}: {e}', e.status)
+                files.append((os.path.splitext(os.path.basename(info.filename))[0], content))
+    else:
+        files = [(os.path.splitext(filename)[0] or 'page', data)]
+
+    pages = []
+    for label, content in files:
+        n_frames = getattr(Image.open(io.BytesIO(content)), 'n_frames', 1)
+        if n_frames == 1:
+            pages.append((label, content, 0))
+        else:
+            for frame in range(n_frames):
+                pages.append((f'{label} p{frame + 1}', content, frame))
+    return pages
+
+
+def prepare_image(img):
+    """Runs the preprocessing stage on a decoded image, if it is enabled."""
+    if not PREPROCESS_ENABLED:
+        return img
+    return preprocess_image(img, **PREPROCESS_OPTIONS)
+
+
+def ocr_signature(config=OCR_CONFIG):
+    """
+    Everything besides the image bytes that changes the OCR output, used in
+    the result cache key so a config or preprocessing change is never
+    answered with stale results.
+    """
+    signature = f'{config}|table={TABLE_MODE}|roi={int(ROI_ENABLED)}'
+    if not PREPROCESS_ENABLED:
+        return signature
+    return f'{signature}|{options_signature(PREPROCESS_OPTIONS)}'
+
+
+def ocr_image(img, config=OCR_CONFIG):
+    """Runs Tesseract on a PIL image and returns the raw text."""
+    return image_to_text(img, config)
+
+
+def region_words(img, config=OCR_CONFIG):
+    """
+    OCRs only the text regions of a prepared image (all of it with ROI off)
+    and returns the words in image coordinates, like ocr_words().
+    """
+    if not ROI_ENABLED:
+        return ocr_words(img, config)
+    words = []
+    for box, psm in find_text_regions(img):
+        left, top = box[0], box[1]
+        crop = img if box == (0, 0, img.width, img.height) else img.crop(box)
+        for x, y, width, height, text in ocr_words(crop, config if psm is None else with_psm(config, psm)):
+            words.append((x + left, y + top, width, height, text))
+    return words
+
+
+def parse_table(text):
+    """
+    Simple table conversion (the most complex and error-prone step).
+    This is a basic attempt. Real table extraction is much harder!
+
+    Args:
+        text (str): Raw OCR output.
+
+    Returns:
+        list: Rows of cells, all padded to the same number of columns.
+    """
+    # Split the text into lines
+    lines = text.strip().split('\n')
+
+    # Simple assumption: data is separated by tabs/spaces or a consistent delimiter
+    data = []
+    for line in lines:
+        # Basic attempt to split based on multiple spaces (common in tables)
+        # This is highly unreliable and depends heavily on the image quality/structure.
+        cells = [cell.strip() for cell in line.split('  ') if cell.strip()]
+        if cells:
+            data.append(cells)
+
+    # Find the maximum number of columns for consistent dataframe creation
+    max_cols = max(len(row) for row in data) if data else 0
+
+    # Pad shorter rows to match the max columns
+    return [row + [''] * (max_cols - len(row)) for row in data]
+
+
+def ocr_table(img, config=OCR_CONFIG, timings=None):
+    """
+    One OCR pass over a prepared image, turned into a table.
+
+    Args:
+        img (PIL.Image.Image): The prepared image.
+        config (str): Tesseract config string.
+        timings (dict): If given, 'ocr' and 'parse' seconds are added to it.
+
+    Returns:
+        dict: {'text': recognised text, 'rows': padded table rows}
+    """
+    timings = {} if timings is None else timings
+    if TABLE_MODE == 'lines':
+        with timed(timings, 'ocr'):
+            text = ocr_image(img, config=config)
+        with timed(timings, 'parse'):
+            rows = parse_table(text)
+        return {'text': text, 'rows': rows}
+    with timed(timings, 'ocr'):
+        words = region_words(img, config)
+    with timed(timings, 'parse'):
+        text, rows = extract_grid(words)
+    return {'text': text, 'rows': rows}
+
+
+def table_stats(rows, timings, size=None):
+    """The 'stats' entry workers attach to fresh results for the metrics."""
+    stats = {'timings': timings, 'rows': len(rows), 'columns': len(rows[0]) if rows else 0}
+    if size:
+        stats['width'], stats['height'] = size
+    return stats
+
+
+def run_ocr(data, config=OCR_CONFIG, frame=0):
+    """
+    Decode + OCR + parse for one uploaded image.
+
+    This is the CPU-heavy part of a conversion and is what the job queue
+    runs inside its worker processes, so it only takes and returns plain
+    picklable (and JSON-serializable, for the result cache) values.
+
+    Args:
+        data (bytes): The uploaded image file content.
+        config (str): Tesseract config string.
+        frame (int): Page to OCR in a multi-page TIFF.
+
+    Returns:
+        dict: {'text': raw OCR text, 'rows': padded table rows, 'stats': stage
+        timings and sizes (see table_stats)}
+    """
+    timings = {}
+    with timed(timings, 'decode'):
+        img = decode_image(data, frame, draft=True)
+        img.load()
+    size = img.size
+    with timed(timings, 'preprocess'):
+        img = prepare_image(img)
+    result = ocr_table(img, config=config, timings=timings)
+    result['stats'] = table_stats(result['rows'], timings, size)
+    return result
+
+
+def needs_tiling(data, frame=0):
+    """
+    True if the image will be tall enough after preprocessing to be worth
+    splitting into bands. Only the image header is read.
+    """
+    if TABLE_MODE != 'boxes':
+        return False  # the line parser has no coordinates to stitch bands with
+    img = decode_image(data, frame)
+    height = img.height
+    if PREPROCESS_ENABLED:
+        opts = dict(DEFAULT_OPTIONS, **PREPROCESS_OPTIONS)
+        height *= downscale_factor(img, opts['target_dpi'], opts['max_pixels'])
+    return height >= 2 * BAND_MIN_HEIGHT
+
+
+def find_bands(ink_per_row, band_count, min_height=BAND_MIN_HEIGHT, overlap=BAND_OVERLAP):
+    """
+    Picks where to cut a page into about `band_count` horizontal bands.
+
+    Cuts go in the middle of the blank gap closest to each ideal cut line, so
+    no text line is split. When there is no gap within half a band of the
+    ideal line, the cut is forced there and the band reaches `overlap` px into
+    its neighbour; each word is then only kept by the band that owns its centre.
+
+    Args:
+        ink_per_row (np.ndarray): Number of ink pixels in every pixel row.
+        band_count (int): Desired number of bands (usually the worker count),
+            None for as many bands of about `min_height` px as fit.
+        min_height (int): Smallest band height in px.
+        overlap (int): Extra px a band extends past a forced cut.
+
+    Returns:
+        list: (top, bottom, keep_top, keep_bottom) tuples. The band image is
+        rows [top, bottom); words centred in [keep_top, keep_bottom) belong to it.
+    """
+    height = len(ink_per_row)
+    band_height = min_height if band_count is None else max(min_height, -(-height // max(1, band_count)))
+    blank = np.flatnonzero(ink_per_row == 0)
+
+    cuts = []  # (cut row, forced?)
+    start = 0
+    while height - start >= band_height + band_height // 2:
+        target = start + band_height
+        lo = np.searchsorted(blank, start + band_height // 2)
+        hi = np.searchsorted(blank, target + band_height // 2)
+        candidates = blank[lo:hi]
+        if len(candidates):
+            cut = int(candidates[np.argmin(np.abs(candidates - target))])
+            cuts.append((cut, False))
+        else:
+            cut = target
+            cuts.append((cut, True))
+        start = cut
+
+    bands = []
+    edges = [(0, False)] + cuts + [(height, False)]
+    for (keep_top, forced_top), (keep_bottom, forced_bottom) in zip(edges, edges[1:]):
+        top = max(0, keep_top - overlap) if forced_top else keep_top
+        bottom = min(height, keep_bottom + overlap) if forced_bottom else keep_bottom
+        bands.append((top, bottom, keep_top, keep_bottom))
+    return bands
+
+
+def split_bands(data, frame=0, band_count=1):
+    """
+    Decodes and preprocesses an image once, then cuts it into bands (see
+    find_bands). Runs in a worker; the band images go back to the caller,
+    which fans them out to the pool.
+
+    Returns:
+        tuple: (bands, stats). bands is a list of dicts with 'image' (PIL image
+        of the band), 'top', 'keep_top' and 'keep_bottom' in page coordinates;
+        stats has the decode/preprocess timings and the original image size.
+    """
+    timings = {}
+    with timed(timings, 'decode'):
+        img = decode_image(data, frame, draft=True)
+        img.load()
+    size = img.size
+    with timed(timings, 'preprocess'):
+        img = prepare_image(img).convert('L')
+        ink_per_row = (np.asarray(img) < 128).sum(axis=1)
+        bands = [
+            {'image': img.crop((0, top, img.width, bottom)), 'top': top,
+             'keep_top': keep_top, 'keep_bottom': keep_bottom}
+            for top, bottom, keep_top, keep_bottom in find_bands(ink_per_row, band_count)
+        ]
+    return bands, {'timings': timings, 'width': size[0], 'height': size[1]}
+
+
+def ocr_band(band, config=OCR_CONFIG):
+    """
+    OCRs one band and returns its words shifted back into page coordinates,
+    dropping words whose centre belongs to a neighbouring band.
+    """
+    words = []
+    for left, top, width, height, text in region_words(band['image'], config):
+        top += band['top']
+        if band['keep_top'] <= top + height / 2 < band['keep_bottom']:
+            words.append((left, top, width, height, text))
+    return words
+
+
+def merge_bands(band_words, timings=None):
+    """Stitches the words of all bands back into one table, rows in page order."""
+    timings = {} if timings is None else timings
+    with timed(timings, 'parse'):
+        text, rows = extract_grid([word for words in band_words for word in words])
+    return {'text': text, 'rows': rows}
+
+
+def extract_table(data, config=OCR_CONFIG, frame=0):
+    """Same as run_ocr() but returns only the padded table rows."""
+    return run_ocr(data, config, frame)['rows']
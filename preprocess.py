@@ -0,0 +1,192 @@
+import numpy as np
+from PIL import Image
+
+# Defaults for preprocess_image(). Tesseract is most accurate around 300 DPI;
+# images without usable DPI info are capped by their pixel count instead
+# (a cap on the longest side would squash long, narrow statements).
+DEFAULT_OPTIONS = {
+    'target_dpi': 300,
+    'max_pixels': 9_000_000,
+    'binarize': True,
+    'window': 0,          # adaptive threshold window in px, 0 = pick from image size
+    'threshold': 0.15,    # how much darker than the local mean a pixel must be to count as ink
+    'deskew': True,
+    'max_skew': 5.0,      # degrees searched either side of horizontal
+    'crop': True,
+    'crop_padding': 10,
+}
+# adaptive_binarize() works through the image this many rows at a time
+BINARIZE_STRIP_ROWS = 256
+
+
+def to_grayscale(img):
+    """Converts any PIL image to 8-bit grayscale, flattening transparency onto white."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    return img.convert('L')
+
+
+def downscale_factor(img, target_dpi=300, max_pixels=9_000_000):
+    """
+    Scale factor downscale() will apply. Only reads the size and DPI, so it is
+    cheap on an image that has been opened but not decoded yet.
+    """
+    scale = 1.0
+    dpi = img.info.get('dpi')
+    if dpi and dpi[0] and float(dpi[0]) > target_dpi:
+        scale = target_dpi / float(dpi[0])
+    pixels = img.width * img.height * scale * scale
+    if pixels > max_pixels:
+        scale *= (max_pixels / pixels) ** 0.5
+    return min(scale, 1.0)
+
+
+def downscale(img, target_dpi=300, max_pixels=9_000_000):
+    """
+    Shrinks the image to `target_dpi` when its DPI is known and higher, and
+    never lets it exceed `max_pixels`. Never upscales.
+    """
+    scale = downscale_factor(img, target_dpi, max_pixels)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.BOX)
+
+
+def adaptive_binarize(gray, window=0, threshold=0.15):
+    """
+    Bradley-style adaptive threshold: a pixel is ink (0) when it is
+    `threshold` darker than the mean of the window around it, else paper (255).
+    Window means come from running sums, so the cost is O(pixels) whatever
+    the window size; they are finished in strips of BINARIZE_STRIP_ROWS rows
+    to keep the temporaries small.
+
+    Args:
+        gray (np.ndarray): 2-D uint8 grayscale array.
+        window (int): Window side in pixels, 0 to derive it from the image size.
+        threshold (float): Relative darkness needed to count as ink.
+
+    Returns:
+        np.ndarray: 2-D uint8 array of 0/255 values.
+    """
+    h, w = gray.shape
+    if not window:
+        window = max(15, min(h, w) // 16)
+    r = window // 2
+
+    # Column running sums fit int32 (at most h * 255); the window sums are then
+    # finished one strip of rows at a time, so no full-size int64 or float
+    # temporaries are ever alive (a 9 MP page used to peak near 400 MB)
+    columns = np.zeros((h + 1, w), dtype=np.int32)
+    np.cumsum(gray, axis=0, dtype=np.int32, out=columns[1:])
+
+    y0 = np.clip(np.arange(h) - r, 0, h)
+    y1 = np.clip(np.arange(h) + r + 1, 0, h)
+    x0 = np.clip(np.arange(w) - r, 0, w)
+    x1 = np.clip(np.arange(w) + r + 1, 0, w)
+    widths = (x1 - x0).astype(np.int64)
+
+    out = np.empty((h, w), dtype=np.uint8)
+    row_sums = np.zeros((min(h, BINARIZE_STRIP_ROWS), w + 1), dtype=np.int64)
+    for top in range(0, h, BINARIZE_STRIP_ROWS):
+        rows = slice(top, min(h, top + BINARIZE_STRIP_ROWS))
+        n = rows.stop - rows.start
+        vertical = columns[y1[rows]] - columns[y0[rows]]
+        np.cumsum(vertical, axis=1, dtype=np.int64, out=row_sums[:n, 1:])
+        sums = row_sums[:n, x1] - row_sums[:n, x0]
+        counts = (y1[rows] - y0[rows])[:, None] * widths[None, :]
+        # gray < mean * (1 - t)  <=>  gray * count < sum * (1 - t), no division needed
+        ink = gray[rows] * counts < sums * (1.0 - threshold)
+        out[rows] = np.where(ink, 0, 255)
+    return out
+
+
+def estimate_skew(binary, max_angle=5.0, step=0.25):
+    """
+    Finds the rotation (degrees, PIL convention) that makes text lines horizontal.
+
+    Every candidate angle projects the ink pixels onto the vertical axis; the
+    angle whose row histogram has the sharpest peaks (largest sum of squared
+    differences) is the one where lines of text line up.
+
+    Args:
+        binary (np.ndarray): 0/255 array from adaptive_binarize().
+        max_angle (float): Largest skew to consider either way.
+        step (float): Angle resolution.
+
+    Returns:
+        float: Angle to pass to Image.rotate(), 0.0 if there is too little ink.
+    """
+    # Work on a ~1000 px copy, plenty for angle estimation
+    stride = max(1, max(binary.shape) // 1000)
+    ys, xs = np.nonzero(binary[::stride, ::stride] == 0)
+    if len(ys) < 100:
+        return 0.0
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64)
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rad = np.deg2rad(angle)
+        rows = np.round(ys * np.cos(rad) + xs * np.sin(rad)).astype(np.int64)
+        hist = np.bincount(rows - rows.min()).astype(np.float64)
+        score = np.sum(np.diff(hist) ** 2)
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    # The projection finds the angle the page is rotated by, undo it
+    return -best_angle if best_angle else 0.0
+
+
+def crop_margins(binary, padding=10):
+    """Returns the (left, top, right, bottom) box around all ink, plus padding."""
+    ink = binary == 0
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    h, w = binary.shape
+    if len(rows) == 0:
+        return 0, 0, w, h
+    return (max(0, cols[0] - padding), max(0, rows[0] - padding),
+            min(w, cols[-1] + 1 + padding), min(h, rows[-1] + 1 + padding))
+
+
+def preprocess_image(img, **options):
+    """
+    Cleans an uploaded image up before OCR: grayscale, DPI-aware downscale,
+    adaptive binarization, deskew and margin cropping. Each step can be
+    switched off or tuned through the DEFAULT_OPTIONS keys.
+
+    Args:
+        img (PIL.Image.Image): The decoded upload.
+        **options: Overrides for DEFAULT_OPTIONS.
+
+    Returns:
+        PIL.Image.Image: An 'L' mode image, usually far smaller than the input.
+    """
+    opts = dict(DEFAULT_OPTIONS, **options)
+
+    img = downscale(to_grayscale(img), opts['target_dpi'], opts['max_pixels'])
+    if not opts['binarize']:
+        return img
+
+    binary = adaptive_binarize(np.asarray(img), opts['window'], opts['threshold'])
+
+    if opts['deskew']:
+        angle = estimate_skew(binary, opts['max_skew'])
+        if angle:
+            rotated = Image.fromarray(binary).rotate(angle, resample=Image.NEAREST,
+                                                      expand=True, fillcolor=255)
+            binary = np.asarray(rotated)
+
+    if opts['crop']:
+        box = crop_margins(binary, opts['crop_padding'])
+        binary = binary[box[1]:box[3], box[0]:box[2]]
+
+    return Image.fromarray(binary)
+
+
+def options_signature(options):
+    """Stable string form of the options, so the OCR cache can tell configurations apart."""
+    opts = dict(DEFAULT_OPTIONS, **options)
+    return ','.join(f'{key}={opts[key]}' for key in sorted(opts))
@@ -0,0 +1,147 @@
+from bisect import bisect_right
+from ocr_engine import image_to_words
+
+# A horizontal gap wider than this many text heights starts a new cell
+CELL_GAP_FACTOR = 1.0
+# Words whose vertical centres are within this many text heights share a row
+ROW_TOLERANCE_FACTOR = 0.5
+
+
+def ocr_words(img, config):
+    """
+    Runs one Tesseract pass and returns the recognised words with their boxes.
+
+    Args:
+        img (PIL.Image.Image): Image to OCR.
+        config (str): Tesseract config string.
+
+    Returns:
+        list: (left, top, width, height, text) tuples, one per word.
+    """
+    return image_to_words(img, config)
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0
+
+
+def group_rows(words):
+    """
+    Sweeps the words top to bottom and groups them into text rows.
+    A word joins the current row while its vertical centre stays within
+    ROW_TOLERANCE_FACTOR text heights of the row's running centre.
+
+    Returns:
+        list: Rows, each a list of words sorted left to right.
+    """
+    if not words:
+        return []
+    tolerance = max(1, _median(w[3] for w in words) * ROW_TOLERANCE_FACTOR)
+
+    rows = []
+    current, centre_sum = [], 0.0
+    for word in sorted(words, key=lambda w: w[1] + w[3] / 2):
+        centre = word[1] + word[3] / 2
+        if current and centre - centre_sum / len(current) > tolerance:
+            rows.append(sorted(current))
+            current, centre_sum = [], 0.0
+        current.append(word)
+        centre_sum += centre
+    rows.append(sorted(current))
+    return rows
+
+
+def group_cells(row, gap):
+    """
+    Joins neighbouring words of one row into cells, splitting where the
+    horizontal gap between words is wider than `gap` pixels.
+
+    Returns:
+        list: (left, right, text) tuples, one per cell.
+    """
+    cells = []
+    left, right, parts = row[0][0], row[0][0] + row[0][2], [row[0][4]]
+    for word in row[1:]:
+        if word[0] - right > gap:
+            cells.append((left, right, ' '.join(parts)))
+            left, parts = word[0], []
+        right = max(right, word[0] + word[2])
+        parts.append(word[4])
+    cells.append((left, right, ' '.join(parts)))
+    return cells
+
+
+def _merge_intervals(intervals, support=1):
+    """
+    Sweeps (left, right) intervals and returns the (left, right) runs of x
+    covered by at least `support` of them.
+    """
+    events = sorted([(left, 1) for left, _ in intervals] + [(right, -1) for _, right in intervals],
+                    key=lambda e: (e[0], -e[1]))
+    runs = []
+    depth = 0
+    for x, step in events:
+        before, depth = depth, depth + step
+        if before < support <= depth:
+            runs.append([x, x])
+        elif depth < support <= before:
+            runs[-1][1] = x
+    return [tuple(run) for run in runs]
+
+
+def column_bands(row_cells):
+    """
+    Finds the table columns from the cells of every row.
+
+    Only rows with two or more cells count: a title, a heading or a "Total"
+    line is one wide cell that would otherwise bridge the gaps between
+    columns. Columns supported by at least half of those rows are found
+    first; a cell overlapping two or more of them spans columns and is left
+    out, and the remaining cells are merged into the final bands.
+
+    Returns:
+        list: Left edges of the columns, ascending.
+    """
+    table_rows = [cells for cells in row_cells if len(cells) >= 2] or row_cells
+    intervals = [(left, right) for cells in table_rows for left, right, _ in cells]
+    strong = _merge_intervals(intervals, support=max(1, len(table_rows) // 2))
+
+    def spans(left, right):
+        return sum(1 for a, b in strong if left < b and right > a) >= 2
+
+    narrow = [(left, right) for left, right in intervals if not spans(left, right)]
+    return [left for left, _ in _merge_intervals(narrow or intervals)]
+
+
+def extract_grid(words):
+    """
+    Turns Tesseract word boxes into a table grid with one sort-and-sweep for
+    rows and one for columns, O(n log n) in the number of words.
+
+    Args:
+        words (list): (left, top, width, height, text) tuples from ocr_words().
+
+    Returns:
+        tuple: (text, rows) where text is the recognised text line by line and
+        rows is the grid of cell strings, every row the same width.
+    """
+    text_rows = group_rows(words)
+    if not text_rows:
+        return '', []
+
+    gap = _median(w[3] for w in words) * CELL_GAP_FACTOR
+    row_cells = [group_cells(row, gap) for row in text_rows]
+    starts = column_bands(row_cells)
+
+    grid = []
+    for cells in row_cells:
+        row = [''] * len(starts)
+        for left, _, cell_text in cells:
+            # Spanning cells and lone lines go to the column they start in
+            col = max(0, bisect_right(starts, left) - 1)
+            row[col] = f'{row[col]} {cell_text}' if row[col] else cell_text
+        grid.append(row)
+
+    text = '\n'.join(' '.join(word[4] for word in row) for row in text_rows)
+    return text, grid